@@ -0,0 +1,229 @@
+"""End-to-end benchmark of the search engine against the local mock site.
+
+    python bench.py --profiles 3 --duration 120 --poll-interval-ms 2000 --slot-every-s 20
+
+Starts mock_rvsq in-process, runs SearchEngine with fresh sessions for the
+given duration, and measures time to first search, polls per minute,
+detection latency (from a slot being published to "SLOT FOUND" in the log)
+and memory per profile. Every run is appended to benchmarks/results.jsonl
+with the current commit and compared to the previous run with the same
+parameters.
+"""
+
+import argparse
+from datetime import datetime
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+
+import meulade
+from mock_rvsq import MockSite, serve
+
+SLOT_FOUND = "🎉 SLOT FOUND! 🎉"
+
+# Metrics where a lower value is better, for the comparison with the last run
+LOWER_IS_BETTER = ('time_to_first_search_s', 'errors', 'detection_to_hold_p50_s', 'detection_latency_p50_s', 'detection_latency_p95_s', 'rss_per_profile_mb')
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+def fake_profiles(count):
+    return [
+        {
+            'label': f"P{i + 1}",
+            'first_name': 'Test',
+            'last_name': f"Patient{i + 1}",
+            'nam': f"TEST{i + 1:04d}0101",
+            'card_seq_number': '01',
+            'birth_day': '01',
+            'birth_month': '01',
+            'birth_year': '1980',
+        }
+        for i in range(count)
+    ]
+
+def write_flow(site_url, path):
+    """Copy of the bundled flow pointed at the mock site"""
+    with open(meulade.get_resource_path('flow.json'), 'r', encoding='utf-8') as f:
+        flow = json.load(f)
+    flow.setdefault('variables', {})['site'] = site_url
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(flow, f, indent=4)
+
+def detection_latencies(published, detections, lifetime):
+    """Seconds from each publication to the first detection after it, per patient"""
+    latencies = []
+    for times in detections.values():
+        for publication in published:
+            found = [t for t in times if publication <= t < publication + lifetime]
+            if found:
+                latencies.append(found[0] - publication)
+    return latencies
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))], 3)
+
+def run_benchmark(args):
+    site = MockSite(
+        latency_ms=args.latency_ms,
+        search_latency_ms=args.search_latency_ms,
+        slot_every_s=args.slot_every_s,
+        slot_lifetime_s=args.slot_lifetime_s,
+        family_doctor=args.family_doctor,
+    )
+    server = serve(site)
+    site_url = f"http://127.0.0.1:{server.server_address[1]}"
+    workdir = tempfile.mkdtemp(prefix='meulade-bench-')
+    flow_file = os.path.join(workdir, 'flow.json')
+    write_flow(site_url, flow_file)
+
+    settings = dict(meulade.DEFAULT_SETTINGS)
+    settings.update({
+        'flow_file': flow_file,
+        'session_dir': os.path.join(workdir, 'sessions'),
+        'step_timings_file': os.path.join(workdir, 'step_timings.json'),
+        'poll_interval_ms': args.poll_interval_ms,
+        'max_concurrent_profiles': args.max_concurrent,
+        'allowed_hosts': ['127.0.0.1'],
+        'headless_browser': True,
+        'launch_profile': args.launch_profile,
+        'http_polling': args.http_polling,
+        'auto_book': args.auto_book,
+        'auto_book_dry_run': not args.confirm,
+    })
+
+    detections = {}  # Log prefix (patient) -> times "SLOT FOUND" was logged
+    lock = threading.Lock()
+
+    def log(message):
+        if args.verbose:
+            print(message)
+        if SLOT_FOUND in message:
+            patient = message.split(']')[0] if message.startswith('[') else ''
+            with lock:
+                detections.setdefault(patient, []).append(time.time())
+
+    engine = meulade.SearchEngine(fake_profiles(args.profiles), settings, log=log)
+    failure = []
+
+    def run_engine():
+        try:
+            engine.run()
+        except Exception as e:
+            failure.append(e)
+
+    # Screenshots and sessions land in the scratch directory
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    started = time.time()
+    thread = threading.Thread(target=run_engine, daemon=True)
+    try:
+        thread.start()
+        thread.join(args.duration)
+        rss = meulade.process_tree_rss()
+        ended = time.time()
+        engine.stop()
+        thread.join()
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+    if failure:
+        raise SystemExit(f"Search engine failed, nothing saved: {failure[0]!r}")
+
+    stats = site.stats()
+    published = [slot['published_at'] for slot in stats['published'] if slot['published_at'] < ended]
+    latencies = detection_latencies(published, detections, args.slot_lifetime_s)
+    first_search = stats['first_search_at']
+    polling_minutes = (ended - first_search) / 60 if first_search else 0
+    detection = engine.metrics.summary('detection').get(None, {})
+    hold = engine.metrics.summary('hold').get(None, {})
+    return {
+        'time_to_first_search_s': round(first_search - started, 3) if first_search else None,
+        'polls': engine.metrics.total('polls'),
+        'polls_per_min': round(engine.metrics.total('polls') / polling_minutes, 2) if polling_minutes else 0,
+        'searches_per_min': round(stats['searches'] / polling_minutes, 2) if polling_minutes else 0,
+        'errors': engine.metrics.total('errors'),
+        'slots_published': len(published),
+        'slots_detected': len(latencies),
+        'detection_latency_p50_s': percentile(latencies, 0.5),
+        'detection_latency_p95_s': percentile(latencies, 0.95),
+        'search_to_detection_p50_s': detection.get('p50_s'),
+        'detection_to_hold_p50_s': hold.get('p50_s'),
+        'slots_held': len(stats['holds']) + len(stats['bookings']),
+        'rss_per_profile_mb': round(rss / args.profiles / (1024 * 1024), 1) if rss is not None else None,
+        'steps': engine.metrics.summary('step', 'step'),
+    }
+
+def compare(previous, results):
+    """Lines showing how every headline metric moved since the previous run"""
+    lines = []
+    for name, value in results.items():
+        old = previous['results'].get(name)
+        if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+            continue
+        change = (value - old) / old * 100
+        better = change < 0 if name in LOWER_IS_BETTER else change > 0
+        lines.append(f"  {name}: {old} -> {value} ({change:+.1f}%{', better' if better and abs(change) >= 1 else ''})")
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark meulade against the local mock site")
+    parser.add_argument('--profiles', type=int, default=1, help="number of patients watched at once")
+    parser.add_argument('--duration', type=float, default=120, help="seconds to run the search for")
+    parser.add_argument('--poll-interval-ms', type=int, default=2000)
+    parser.add_argument('--max-concurrent', type=int, default=4, help="max_concurrent_profiles setting")
+    parser.add_argument('--launch-profile', default='default', choices=('default', 'lean'))
+    parser.add_argument('--http-polling', action='store_true')
+    parser.add_argument('--latency-ms', type=float, default=100, help="mock page latency")
+    parser.add_argument('--search-latency-ms', type=float, default=300, help="mock search latency")
+    parser.add_argument('--slot-every-s', type=float, default=20, help="the mock publishes a slot this often")
+    parser.add_argument('--slot-lifetime-s', type=float, default=15)
+    parser.add_argument('--auto-book', action='store_true', help="hold every detected slot (dry run)")
+    parser.add_argument('--confirm', action='store_true', help="with --auto-book, also confirm the booking on the mock")
+    parser.add_argument('--family-doctor', action='store_true', help="go through the GMF branch of the flow")
+    parser.add_argument('--output', default=os.path.join('benchmarks', 'results.jsonl'))
+    parser.add_argument('--verbose', action='store_true', help="print the search log")
+    args = parser.parse_args()
+
+    params = {name: value for name, value in vars(args).items() if name not in ('output', 'verbose')}
+    output = os.path.abspath(args.output)
+    results = run_benchmark(args)
+    entry = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'params': params,
+        'results': results,
+    }
+
+    print(json.dumps({name: value for name, value in results.items() if name != 'steps'}, indent=4))
+    previous = None
+    if os.path.exists(output):
+        with open(output, 'r', encoding='utf-8') as f:
+            for line in f:
+                old = json.loads(line)
+                if old.get('params') == params:
+                    previous = old
+    if previous:
+        print(f"Compared to {previous['commit'] or 'unknown commit'} ({previous['date']}):")
+        print('\n'.join(compare(previous, results)))
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    print(f"Saved to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -25,6 +25,7 @@ command = [
     '--name=Meulade',
     '--clean',
     '--add-data=config.json;.',
+    '--add-data=flow.json;.',
     f'--add-binary={browser_dir}/*;.',
     '--collect-all=playwright',
     '--collect-all=pygame',
@@ -1,12 +1,198 @@
-from playwright.sync_api import sync_playwright
+import argparse
+import asyncio
+import concurrent.futures
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, field
+import functools
+import hashlib
+from html.parser import HTMLParser
+import importlib
+import io
 import json
+import logging
+import logging.handlers
+import math
 import os
-import pygame
+import queue
+import random
+import re
+import shutil
+import signal
+import sqlite3
+import struct
+import subprocess
+import tempfile
 import threading
-from datetime import datetime
-import winsound
-import webbrowser
+from datetime import date, datetime, timedelta
 import sys
+import time
+from urllib.parse import urlparse
+import urllib.request
+import wave
+
+# Playwright is imported by import_playwright() when a search first needs it,
+# so the window shows up without paying for it. pygame is only imported by
+# the window, so headless mode runs without SDL.
+async_playwright = None
+PlaywrightTimeoutError = None
+pygame = None
+
+def import_playwright():
+    global async_playwright, PlaywrightTimeoutError
+    if async_playwright is None:
+        from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+def import_pygame():
+    global pygame
+    if pygame is None:
+        import pygame
+
+@functools.lru_cache(maxsize=None)
+def optional_module(name):
+    """Import a module on first use, or None when it is not installed (psutil, Pillow, winsound...)"""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
+
+# Defaults for the optional "settings" section of config.json
+DEFAULT_SETTINGS = {
+    'max_concurrent_profiles': 4,  # Contexts allowed to drive the shared browser at the same time
+    'step_timeout_ms': 30000,  # Upper bound for any single step of the form flow
+    'navigation_timeout_ms': 60000,  # Upper bound for page loads
+    'search_timeout_ms': 30000,  # Upper bound for one search request and its results
+    'poll_interval_ms': 5000,  # Pause between two searches (the baseline when adaptive_polling is on)
+    'adaptive_polling': True,  # Vary the pause with the slot release history and the health of the site
+    'poll_interval_min_ms': 2000,  # Shortest pause, used around the times slots were released before
+    'poll_interval_max_ms': 60000,  # Longest pause, for quiet hours or a struggling site
+    'release_history_file': 'release_history.json',  # When new slots were detected, to learn release times
+    'release_window_min': 10,  # Minutes around a past release time of day polled at the shortest pause
+    # Which slots count at all: one rule or a list of rules (a slot has to
+    # match one of them), see compile_slot_filter(). A profile can have its
+    # own "slot_filters". Other slots are ignored: no beep, no screenshot.
+    'slot_filters': [],
+    # Auto-booking: a new slot that also matches auto_book_filters is held
+    # right away with the "booking" steps of flow.json, in the page that just
+    # showed it. With auto_book_dry_run the confirmation step is skipped.
+    'auto_book': False,
+    'auto_book_dry_run': True,
+    'auto_book_filters': [],
+    'search_url_pattern': '',  # Regex for the search request URL, empty matches any POST of the page
+    'session_dir': 'sessions',  # Where authenticated sessions are saved between runs
+    'resume_timeout_ms': 10000,  # How long a saved session may take to show the search page again
+    'persistent_profile': False,  # One on-disk Chromium profile (with HTTP cache) per patient instead of a shared browser
+    'http_polling': False,  # Replay the search request over HTTP once the session is set up, without a page
+    # Requests aborted before they leave the browser. Stylesheets are kept by
+    # default because the visibility checks of the flow depend on them.
+    'block_resource_types': ['image', 'font', 'media'],
+    'blocked_hosts': [
+        'google-analytics.com', 'googletagmanager.com', 'doubleclick.net',
+        'facebook.net', 'facebook.com', 'hotjar.com', 'clarity.ms',
+    ],
+    'block_third_party': False,  # Also abort every host not listed in allowed_hosts
+    'allowed_hosts': ['rvsq.gouv.qc.ca'],
+    'launch_profile': 'default',  # 'lean' runs headless with a trimmed down Chromium
+    'retry_base_ms': 2000,  # First retry delay, doubled after every consecutive failure
+    'retry_max_ms': 300000,  # Cap of the retry delay
+    'escalate_after_failures': 2,  # Consecutive failures before recovering from an earlier step
+    'circuit_breaker_failures': 6,  # Consecutive failures that open the circuit breaker
+    'circuit_breaker_cooldown_ms': 900000,  # Pause while the circuit breaker is open
+    'flow_file': 'flow.json',  # Form flow definition, a local copy wins over the bundled one
+    'step_timings_file': 'step_timings.json',  # Where the duration of every flow step is summarised
+    # Search criteria watched side by side in pages of the same context, each
+    # one a set of flow variables such as consulting_reason, perimeter or
+    # postal_code. A profile can have its own "search_variants" list.
+    'search_variants': [],
+    'slot_ttl_s': 600,  # A slot not seen for this long is announced again when it comes back
+    'capture_format': 'jpeg',  # 'jpeg', 'png', or 'webp' (needs Pillow)
+    'capture_quality': 60,  # JPEG/WebP quality
+    'capture_full_page': False,  # Screenshot the whole page when the results element is not found
+    'evidence_max_mb': 200,  # Size budget of each evidence directory, oldest files go first
+    'evidence_max_age_days': 14,  # Evidence older than this is deleted
+    'prewarm_browser': False,  # Start the browser with the app and keep it open between searches
+    'headless_browser': False,  # Hide the Chromium window (always on in --headless mode)
+    'trace_file': '',  # JSONL file receiving every timing and counter as it happens, '' to disable
+    'metrics_port': 0,  # Serve Prometheus metrics on http://127.0.0.1:<port>/metrics, 0 to disable
+    'notifications': ['sound'],  # Channels told about new slots: 'sound', 'desktop', 'webhook', 'command', 'file'
+    'notification_webhook_url': '',  # Receives a JSON POST for every notification
+    'notification_command': '',  # Shell command run for every notification, with the JSON on stdin
+    'notification_file': 'notifications.jsonl',  # Receives one JSON line per notification
+    'log_file': 'meulade.log',  # Every log message is mirrored here, '' to disable
+    'log_max_kb': 1024,  # Size at which the log file is rotated
+    'log_backups': 3,  # Rotated log files kept (meulade.log.1, .2...)
+    # Playwright trace of the last polls, saved to traces/ only when a poll
+    # fails or finds slots. With 1 the trace of a healthy poll is dropped
+    # without touching the disk; more keeps the previous ones in a temp dir.
+    # 0 disables tracing.
+    'trace_buffer_polls': 1,
+    'trace_screenshots': False,  # Add a screencast to the traces (heavier on CPU)
+    'history_db': 'history.sqlite3',  # SQLite file receiving every poll and the slots it saw, '' to disable
+}
+
+EVIDENCE_DIRECTORIES = ["screenshots", "error_screenshots", "traces"]
+
+# Recovery steps, from the most to the least expensive. A failure restarts
+# the watch from the step it maps to; repeated failures move one step earlier.
+RECOVERY_STEPS = ['browser', 'context', 'session', 'poll']
+FAILURE_RECOVERY = {
+    'timeout': 'poll',
+    'site_error': 'poll',
+    'navigation': 'session',
+    'session_expired': 'session',
+    'broken': 'context',
+    'unknown': 'session',
+}
+
+# Extra Chromium flags of the 'lean' launch profile
+LEAN_CHROMIUM_ARGS = [
+    '--disable-gpu',
+    '--disable-extensions',
+    '--disable-component-extensions-with-background-pages',
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-dev-shm-usage',
+    '--no-first-run',
+    '--mute-audio',
+    '--renderer-process-limit=2',
+    '--disk-cache-size=10485760',
+    '--media-cache-size=1',
+]
+
+# Headers of a recorded request that must not be replayed as-is
+REPLAY_SKIPPED_HEADERS = {'cookie', 'content-length', 'host', 'connection'}
+
+VARIABLE_PATTERN = re.compile(r'\{(\w+)\}')
+
+# Armed right before a search click: the results predicate below only accepts
+# a DOM that changed since then (or a brand new document after a postback)
+ARM_RESULTS_JS = """() => {
+    window.__meuladeChanged = false;
+    const observer = new MutationObserver(() => {
+        window.__meuladeChanged = true;
+        observer.disconnect();
+    });
+    observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+}"""
+
+# Resolves to 'none' or 'slots' once the search results are on screen
+RESULTS_READY_JS = """() => {
+    if (window.__meuladeChanged === false) return null;
+    const visible = el => !!el && !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+    const text = document.body.innerText;
+    if (visible(document.getElementById('clinicsWithNoDisponibilities'))
+            || text.includes('Aucun rendez-vous rpondant')
+            || text.includes('Aucun rendez-vous répondant')) {
+        return 'none';
+    }
+    if (text.includes('Les cliniques suivantes offrent des disponibilités pour votre rendez-vous')) {
+        return 'slots';
+    }
+    return null;
+}"""
 
 def get_playwright_path():
     """Get the correct path for Playwright resources when bundled"""
@@ -16,8 +202,2263 @@ def get_playwright_path():
         }
     return None
 
+def get_resource_path(name):
+    """Path of a file shipped next to meulade.py, or inside the executable"""
+    if getattr(sys, 'frozen', False):
+        base_path = sys._MEIPASS
+    else:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_path, name)
+
+def load_flow(settings):
+    """Load the flow definition.
+
+    A flow file in the working directory wins over the bundled one, so the
+    flow can be patched after a site change without rebuilding the app.
+    """
+    path = settings['flow_file']
+    if not os.path.exists(path):
+        path = get_resource_path(os.path.basename(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def get_launch_args(settings):
+    """Chromium launch options for the configured launch profile"""
+    launch_args = {
+        'headless': settings['headless_browser'],
+        'args': ['--disable-redirect-limits']
+    }
+    if settings['launch_profile'] == 'lean':
+        launch_args['headless'] = True
+        launch_args['args'] += LEAN_CHROMIUM_ARGS
+    return launch_args
+
+def host_matches(host, domains):
+    """Whether host is one of domains or a subdomain of one of them"""
+    return any(host == domain or host.endswith('.' + domain) for domain in domains)
+
+def process_tree_rss():
+    """Resident memory of this process and everything it spawned (Playwright driver and Chromium).
+
+    Returns None when psutil is not installed.
+    """
+    psutil = optional_module('psutil')
+    if psutil is None:
+        return None
+    total = 0
+    process = psutil.Process()
+    for proc in [process] + process.children(recursive=True):
+        try:
+            total += proc.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+def log_file_handler(path, settings):
+    """Size-rotated log file handler"""
+    handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=settings['log_max_kb'] * 1024, backupCount=settings['log_backups'], encoding='utf-8'
+    )
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    return handler
+
+def load_config(path='config.json'):
+    """Load config.json, or an empty config if it does not exist yet"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def get_settings(config):
+    """Merge the "settings" section of the config over the defaults"""
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(config.get('settings', {}))
+    return settings
+
+def get_profiles(config):
+    """Return every patient to search for: the main form first, then the roster"""
+    profiles = []
+    if config.get('personal_info'):
+        profiles.append(config['personal_info'])
+    profiles.extend(config.get('profiles', []))
+    return profiles
+
+def get_profile_key(profile):
+    """Stable file-safe id for a patient, without putting the NAM in file names"""
+    nam = profile.get('nam', '').replace(' ', '').upper()
+    return hashlib.sha1(nam.encode('utf-8')).hexdigest()[:12]
+
+def get_profile_label(profile):
+    """Short name used to tell patients apart in the log"""
+    return profile.get('label') or f"{profile.get('first_name', '')} {profile.get('last_name', '')[:1]}".strip()
+
+NO_SLOTS_MARKERS = (
+    'Aucun rendez-vous rpondant',
+    'Aucun rendez-vous répondant',
+)
+SLOTS_MARKER = 'Les cliniques suivantes offrent des disponibilités'
+
+MONTHS = 'janvier|février|fevrier|mars|avril|mai|juin|juillet|août|aout|septembre|octobre|novembre|décembre|decembre'
+DATE_PATTERN = re.compile(rf'\b(\d{{4}}-\d{{2}}-\d{{2}}|\d{{1,2}}(?:er)? (?:{MONTHS}) \d{{4}})\b', re.IGNORECASE)
+TIME_PATTERN = re.compile(r'\b(\d{1,2} ?[h:] ?\d{2})\b')
+DISTANCE_PATTERN = re.compile(r'(\d+(?:[.,]\d+)?) ?km\b', re.IGNORECASE)
+PROFESSIONAL_PATTERN = re.compile(r'^(?:Dr|Dre|Docteur|Docteure|Inf\.|Infirmi)', re.IGNORECASE)
+
+@dataclass(frozen=True)
+class Slot:
+    """One available appointment, as announced by the search response"""
+    clinic: str
+    date: str = ''
+    time: str = ''
+    professional: str = ''
+    distance_km: float = None
+
+@dataclass
+class SearchResult:
+    """Parsed answer of one search request.
+
+    state is 'slots', 'none', or None when the payload could not be understood
+    and the rendered page has to be read instead.
+    """
+    state: str = None
+    slots: list = field(default_factory=list)
+    size: int = 0
+    body: bytes = b''
+    variant: object = field(default=None, repr=False, compare=False)  # SearchVariant that got this answer
+    # Variant whose page lists each slot, when variants were merged
+    slot_variants: dict = field(default_factory=dict, repr=False, compare=False)
+
+    @property
+    def clinics(self):
+        """Slot count per clinic, in the order the site lists them"""
+        counts = {}
+        for slot in self.slots:
+            counts[slot.clinic] = counts.get(slot.clinic, 0) + 1
+        return counts
+
+# Stands for the slots of a result whose details could not be read
+UNKNOWN_SLOT = Slot(clinic='')
+
+class SlotIndex:
+    """Slots seen recently, so each one is only announced once.
+
+    Slots are compared on all their fields, so a slot whose date, time or
+    professional changed counts as new. A slot is forgotten ttl seconds
+    after it was last seen.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.last_seen = {}  # Slot -> time.monotonic() of the last poll that saw it
+
+    def update(self, slots, now=None):
+        """Record the slots of one poll and return the ones that are new"""
+        now = time.monotonic() if now is None else now
+        for slot, seen in list(self.last_seen.items()):
+            if now - seen > self.ttl:
+                del self.last_seen[slot]
+        new_slots = [slot for slot in slots if slot not in self.last_seen]
+        for slot in slots:
+            self.last_seen[slot] = now
+        return new_slots
+
+class ResultsHTMLParser(HTMLParser):
+    """Collects the clinic blocks of the search results markup.
+
+    A clinic block is an element whose id or class mentions a clinic and that
+    contains no other clinic block. Anything inside the "no availabilities"
+    section is ignored.
+    """
+    HEADINGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'strong', 'b'}
+    VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.depth = 0
+        self.excluded_depth = None
+        self.open_blocks = []
+        self.blocks = []
+        self.heading_depth = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.VOID_TAGS:
+            return
+        self.depth += 1
+        attrs = dict(attrs)
+        marker = f"{attrs.get('id') or ''} {attrs.get('class') or ''}".lower()
+        if self.excluded_depth is not None:
+            return
+        if 'nodisponibilit' in marker:
+            self.excluded_depth = self.depth
+        elif 'clinic' in marker or 'clinique' in marker:
+            if self.open_blocks:
+                self.open_blocks[-1]['has_children'] = True
+            self.open_blocks.append({'depth': self.depth, 'name': '', 'texts': [], 'has_children': False})
+        elif self.open_blocks and tag in self.HEADINGS and not self.open_blocks[-1]['name']:
+            self.heading_depth = self.depth
+
+    def handle_endtag(self, tag):
+        if tag in self.VOID_TAGS:
+            return
+        if self.excluded_depth == self.depth:
+            self.excluded_depth = None
+        if self.heading_depth == self.depth:
+            self.heading_depth = None
+        if self.open_blocks and self.open_blocks[-1]['depth'] == self.depth:
+            block = self.open_blocks.pop()
+            if not block['has_children']:
+                self.blocks.append(block)
+        self.depth = max(0, self.depth - 1)
+
+    def handle_data(self, data):
+        data = ' '.join(data.split())
+        if not data or self.excluded_depth is not None or not self.open_blocks:
+            return
+        block = self.open_blocks[-1]
+        if self.heading_depth is not None:
+            block['name'] = f"{block['name']} {data}".strip()
+        else:
+            block['texts'].append(data)
+
+    def slots(self):
+        slots = []
+        for block in self.blocks:
+            clinic = block['name'] or (block['texts'][0] if block['texts'] else '')
+            slots.extend(slots_from_texts(clinic, block['texts']))
+        return slots
+
+def slots_from_texts(clinic, texts):
+    """Turn the texts of one clinic block into slots, pairing each time with the last date seen"""
+    date = ''
+    professional = ''
+    distance = None
+    slots = []
+    for text in texts:
+        distance_match = DISTANCE_PATTERN.search(text)
+        if distance_match and distance is None:
+            distance = float(distance_match.group(1).replace(',', '.'))
+        if PROFESSIONAL_PATTERN.match(text):
+            professional = text
+        date_match = DATE_PATTERN.search(text)
+        if date_match:
+            date = date_match.group(1)
+        for time in TIME_PATTERN.findall(text):
+            slots.append((date, time.replace(' ', ''), professional))
+    if not slots:
+        slots.append((date, '', professional))
+    return [Slot(clinic, date, time, professional, distance) for date, time, professional in slots]
+
+def slots_from_json(data, clinic=''):
+    """Walk a JSON payload and yield a slot for every object that has a clinic and a date.
+
+    The keys are only guessed, so these slots never decide the state of a
+    result on their own, see parse_search_response().
+    """
+    if isinstance(data, list):
+        for item in data:
+            yield from slots_from_json(item, clinic)
+    elif isinstance(data, dict):
+        date = time = professional = ''
+        distance = None
+        for key, value in data.items():
+            key = key.lower()
+            if isinstance(value, str):
+                if 'clinic' in key or 'clinique' in key or key in ('name', 'nom'):
+                    clinic = clinic if key in ('name', 'nom') and clinic else value
+                elif ('date' in key or 'start' in key or 'debut' in key) and not ('naissance' in key or 'birth' in key):
+                    date = value
+                elif 'heure' in key or 'time' in key:
+                    time = value
+                elif 'professional' in key or 'professionnel' in key or 'doctor' in key or 'medecin' in key:
+                    professional = value
+            elif isinstance(value, (int, float)) and 'distance' in key:
+                distance = float(value)
+        if clinic and date:
+            yield Slot(clinic, date, time, professional, distance)
+        for value in data.values():
+            if isinstance(value, (list, dict)):
+                yield from slots_from_json(value, clinic)
+
+def parse_search_response(body, content_type=''):
+    """Read availability straight from the payload of the search request.
+
+    Understands JSON (including ASP.NET's {"d": "<html>"} wrapping), HTML
+    documents and UpdatePanel fragments. The clinic section header and the
+    "no appointment" sentence decide the state, like on the rendered page.
+    Slots walked out of the JSON are only used when the header is there and
+    its markup lists none, since any object with a name and a date looks
+    like one.
+    """
+    text = body.decode('utf-8', errors='replace') if isinstance(body, bytes) else body
+    result = SearchResult(size=len(body), body=body if isinstance(body, bytes) else body.encode('utf-8'))
+    json_slots = []
+    markup = text
+    if 'json' in content_type or text.lstrip()[:1] in ('{', '['):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = None
+        if data is not None:
+            json_slots = list(dict.fromkeys(slots_from_json(data)))
+            if isinstance(data, dict) and isinstance(data.get('d'), str):
+                markup = data['d']
+
+    if SLOTS_MARKER in markup:
+        result.state = 'slots'
+        parser = ResultsHTMLParser()
+        parser.feed(markup)
+        parser.close()
+        result.slots = parser.slots()
+        if json_slots and not result.slots:
+            # Structured payload whose markup only carries the header
+            result.slots = json_slots
+    elif any(marker in markup for marker in NO_SLOTS_MARKERS):
+        result.state = 'none'
+    return result
+
+WEEKDAYS = {
+    'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6,
+    'lun': 0, 'mar': 1, 'mer': 2, 'jeu': 3, 'ven': 4, 'sam': 5, 'dim': 6,
+}
+MONTH_NUMBERS = {
+    'janvier': 1, 'février': 2, 'fevrier': 2, 'mars': 3, 'avril': 4, 'mai': 5, 'juin': 6, 'juillet': 7,
+    'août': 8, 'aout': 8, 'septembre': 9, 'octobre': 10, 'novembre': 11, 'décembre': 12, 'decembre': 12,
+}
+FRENCH_DATE_PATTERN = re.compile(rf'(\d{{1,2}})(?:er)? ({MONTHS}) (\d{{4}})', re.IGNORECASE)
+CLOCK_PATTERN = re.compile(r'(\d{1,2}) ?[h:] ?(\d{2})')
+SLOT_FILTER_KEYS = {'clinics', 'exclude_clinics', 'max_distance_km', 'weekdays', 'hours', 'earliest_date', 'latest_date', 'within_days'}
+
+@functools.lru_cache(maxsize=4096)
+def parse_slot_date(text):
+    """Date of a slot ('2026-10-21' or '21 octobre 2026'), None when unreadable"""
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        pass
+    match = FRENCH_DATE_PATTERN.search(text)
+    if match:
+        try:
+            return date(int(match.group(3)), MONTH_NUMBERS[match.group(2).lower()], int(match.group(1)))
+        except ValueError:
+            return None
+    return None
+
+@functools.lru_cache(maxsize=4096)
+def parse_clock(text):
+    """Minutes since midnight of '9h30', '09:30' or '09 h 30', None when unreadable"""
+    match = CLOCK_PATTERN.search(text)
+    return int(match.group(1)) * 60 + int(match.group(2)) if match else None
+
+def compile_slot_rule(rule):
+    """Turn one filter rule into a predicate, every condition of it has to hold.
+
+    A condition on a detail the slot does not have (no distance, unreadable
+    date...) does not reject it, so slots read from the page still count.
+    """
+    unknown = set(rule) - SLOT_FILTER_KEYS
+    if unknown:
+        raise ValueError(f"Unknown slot filter key(s): {', '.join(sorted(unknown))}")
+    checks = []
+
+    if rule.get('clinics'):
+        allowed = tuple(name.lower() for name in rule['clinics'])
+        checks.append(lambda slot: not slot.clinic or any(name in slot.clinic.lower() for name in allowed))
+    if rule.get('exclude_clinics'):
+        denied = tuple(name.lower() for name in rule['exclude_clinics'])
+        checks.append(lambda slot: not any(name in slot.clinic.lower() for name in denied))
+    if rule.get('max_distance_km') is not None:
+        max_distance = float(rule['max_distance_km'])
+        checks.append(lambda slot: slot.distance_km is None or slot.distance_km <= max_distance)
+    if rule.get('weekdays'):
+        weekdays = set()
+        for day in rule['weekdays']:
+            weekday = day if isinstance(day, int) else WEEKDAYS.get(str(day).lower()[:3])
+            if weekday not in range(7):
+                raise ValueError(f"Bad slot filter weekday '{day}', expected 'mon'...'sun' or 'lun'...'dim'")
+            weekdays.add(weekday)
+        weekdays = frozenset(weekdays)
+        checks.append(lambda slot: parse_slot_date(slot.date) is None or parse_slot_date(slot.date).weekday() in weekdays)
+    if rule.get('hours'):
+        windows = []
+        for window in rule['hours']:
+            parts = str(window).split('-')
+            start, end = (parse_clock(part) for part in parts) if len(parts) == 2 else (None, None)
+            if start is None or end is None:
+                raise ValueError(f"Bad slot filter hours '{window}', expected 'HH:MM-HH:MM'")
+            windows.append((start, end))
+        windows = tuple(windows)
+
+        def in_hours(slot):
+            minute = parse_clock(slot.time)
+            if minute is None:
+                return True
+            # A window ending before it starts goes past midnight
+            return any(start <= minute <= end if start <= end else minute >= start or minute <= end for start, end in windows)
+        checks.append(in_hours)
+    if rule.get('earliest_date') is not None:
+        earliest = date.fromisoformat(str(rule['earliest_date']))
+        checks.append(lambda slot: parse_slot_date(slot.date) is None or parse_slot_date(slot.date) >= earliest)
+    if rule.get('latest_date') is not None:
+        latest = date.fromisoformat(str(rule['latest_date']))
+        checks.append(lambda slot: parse_slot_date(slot.date) is None or parse_slot_date(slot.date) <= latest)
+    if rule.get('within_days') is not None:
+        days = timedelta(days=int(rule['within_days']))
+        checks.append(lambda slot: parse_slot_date(slot.date) is None or parse_slot_date(slot.date) <= date.today() + days)
+
+    checks = tuple(checks)
+    return lambda slot: all(check(slot) for check in checks)
+
+def compile_slot_filter(rules):
+    """Compile slot filter rules into one predicate over Slot.
+
+    rules is one rule or a list of rules, and a slot has to match one of
+    them; no rule lets every slot through. A rule is a dict of:
+    clinics / exclude_clinics (name fragments), max_distance_km, weekdays
+    (["mon", "sat"] or ["lun", "sam"]), hours (["07:00-09:00", "17:00-21:00"]),
+    earliest_date / latest_date ("2026-11-01") and within_days.
+    """
+    if isinstance(rules, dict):
+        rules = [rules]
+    predicates = tuple(compile_slot_rule(rule) for rule in rules or [])
+    if not predicates:
+        return lambda slot: True
+    if len(predicates) == 1:
+        return predicates[0]
+    return lambda slot: any(predicate(slot) for predicate in predicates)
+
+def merge_results(results):
+    """Combine the results of several search variants, a slot seen by several of them counts once"""
+    if len(results) == 1:
+        return results[0]
+    merged = SearchResult(size=sum(result.size for result in results))
+    hits = [result for result in results if result.state == 'slots']
+    if hits:
+        merged.state = 'slots'
+        merged.slots = list(dict.fromkeys(slot for result in hits for slot in result.slots))
+        merged.body = hits[0].body
+        merged.variant = hits[0].variant
+        for result in hits:
+            for slot in result.slots:
+                merged.slot_variants.setdefault(slot, result.variant)
+    elif all(result.state == 'none' for result in results):
+        merged.state = 'none'
+    return merged
+
+class EvidenceWriter:
+    """Writes screenshots and saved responses from a background thread.
+
+    submit() only hashes the data and queues it, so the search never waits on
+    the disk. Data identical to something already written is dropped, WebP
+    conversion happens on the writer thread, and after every write the
+    evidence directories are pruned by age and total size.
+    """
+
+    def __init__(self, settings, directories):
+        self.settings = settings
+        self.directories = directories
+        self.queue = queue.Queue()
+        self.hashes = set()
+        self.pending = set()  # Paths queued but not written yet
+        self.thread = None
+
+    def start(self):
+        for directory in self.directories:
+            os.makedirs(directory, exist_ok=True)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """Write everything still queued, then stop the thread"""
+        if self.thread:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def submit(self, directory, name, data, extension, convert=None):
+        """Queue data for writing as directory/name.extension.
+
+        Returns the path it will be written to, or None if the same content
+        was already written.
+        """
+        digest = hashlib.sha1(data).hexdigest()
+        if digest in self.hashes:
+            return None
+        self.hashes.add(digest)
+        path = os.path.join(directory, f"{name}.{extension}")
+        suffix = 1
+        while os.path.exists(path) or path in self.pending:
+            path = os.path.join(directory, f"{name}_{suffix}.{extension}")
+            suffix += 1
+        self.pending.add(path)
+        self.queue.put((path, data, convert))
+        return path
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            path, data, convert = item
+            try:
+                if convert:
+                    data = convert(data)
+                with open(path, 'wb') as f:
+                    f.write(data)
+                self.prune()
+            except Exception as e:
+                print(f"Warning: Could not write {path}: {str(e)}")
+            finally:
+                self.pending.discard(path)
+
+    def prune(self):
+        """Delete evidence past the age limit, then the oldest files until under the size budget"""
+        max_age = self.settings['evidence_max_age_days'] * 86400
+        max_bytes = self.settings['evidence_max_mb'] * 1024 * 1024
+        now = time.time()
+        for directory in self.directories:
+            files = []
+            for entry in os.scandir(directory):
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if now - stat.st_mtime > max_age:
+                    os.remove(entry.path)
+                else:
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= max_bytes:
+                    break
+                os.remove(path)
+                total -= size
+
+def to_webp(data, quality):
+    """Re-encode a PNG screenshot as WebP (runs on the evidence writer thread)"""
+    Image = optional_module('PIL.Image')
+    output = io.BytesIO()
+    Image.open(io.BytesIO(data)).save(output, format='WEBP', quality=quality)
+    return output.getvalue()
+
+@functools.lru_cache(maxsize=None)
+def alert_wav():
+    """The two-tone alert (1000 Hz then 2000 Hz, half a second each) as WAV bytes"""
+    rate = 22050
+    frames = b''.join(
+        struct.pack('<h', int(12000 * math.sin(2 * math.pi * frequency * i / rate)))
+        for frequency in (1000, 2000)
+        for i in range(rate // 2)
+    )
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(frames)
+    return output.getvalue()
+
+def notify_sound(notification, settings):
+    """winsound on Windows, else the pygame mixer when the window is open, else the terminal bell"""
+    winsound = optional_module('winsound')
+    if winsound:
+        winsound.Beep(1000, 500)
+        winsound.Beep(2000, 500)
+    elif pygame is not None:
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        sound = pygame.mixer.Sound(file=io.BytesIO(alert_wav()))
+        sound.play()
+        time.sleep(sound.get_length())
+    else:
+        sys.stdout.write('\a')
+        sys.stdout.flush()
+
+def notify_desktop(notification, settings):
+    """plyer when installed, else notify-send (Linux) or osascript (macOS)"""
+    title, message = notification['title'], notification['message']
+    plyer = optional_module('plyer')
+    if plyer is not None:
+        plyer.notification.notify(title=title, message=message, app_name='Meulade', timeout=30)
+    elif shutil.which('notify-send'):
+        subprocess.run(['notify-send', '--urgency=critical', title, message], check=True, timeout=10)
+    elif shutil.which('osascript'):
+        script = f"display notification {json.dumps(message)} with title {json.dumps(title)}"
+        subprocess.run(['osascript', '-e', script], check=True, timeout=10)
+    else:
+        raise RuntimeError("no desktop notifier (install plyer)")
+
+def notify_webhook(notification, settings):
+    request = urllib.request.Request(
+        settings['notification_webhook_url'],
+        data=json.dumps(notification).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        response.read()
+
+def notify_command(notification, settings):
+    env = dict(os.environ, MEULADE_TITLE=notification['title'], MEULADE_MESSAGE=notification['message'])
+    subprocess.run(
+        settings['notification_command'], shell=True, check=True, timeout=30,
+        input=json.dumps(notification).encode('utf-8'), env=env
+    )
+
+def notify_file(notification, settings):
+    with open(settings['notification_file'], 'a', encoding='utf-8') as f:
+        f.write(json.dumps(notification, ensure_ascii=False) + '\n')
+
+# Notification channels by name, each called with (notification, settings)
+NOTIFICATION_BACKENDS = {
+    'sound': notify_sound,
+    'desktop': notify_desktop,
+    'webhook': notify_webhook,
+    'command': notify_command,
+    'file': notify_file,
+}
+
+class Notifier:
+    """Delivers notifications from background threads, one per channel.
+
+    notify() only queues, so the search never waits on a beep or a webhook,
+    and a slow channel does not hold back the others.
+    """
+
+    def __init__(self, settings, log):
+        self.settings = settings
+        self.log = log
+        self.channels = {}  # Channel name -> (queue, thread)
+
+    def start(self):
+        for name in self.settings['notifications']:
+            if name not in NOTIFICATION_BACKENDS:
+                self.log(f"[DEBUG] Unknown notification channel '{name}'")
+                continue
+            channel_queue = queue.Queue()
+            thread = threading.Thread(target=self.run, args=(name, channel_queue), daemon=True)
+            thread.start()
+            self.channels[name] = (channel_queue, thread)
+
+    def close(self):
+        """Deliver everything still queued, then stop the threads"""
+        for channel_queue, thread in self.channels.values():
+            channel_queue.put(None)
+        for channel_queue, thread in self.channels.values():
+            thread.join()
+        self.channels = {}
+
+    def notify(self, title, message, **details):
+        notification = dict(details, title=title, message=message, time=datetime.now().isoformat(timespec='seconds'))
+        for channel_queue, _ in self.channels.values():
+            channel_queue.put(notification)
+
+    def run(self, name, channel_queue):
+        backend = NOTIFICATION_BACKENDS[name]
+        while True:
+            notification = channel_queue.get()
+            if notification is None:
+                return
+            try:
+                backend(notification, self.settings)
+            except Exception as e:
+                self.log(f"[DEBUG] Notification via {name} failed: {e}")
+
+class SessionExpired(Exception):
+    """The site no longer accepts our session and the form flow has to run again"""
+
+class SiteError(Exception):
+    """The site answered, but with an error or a page the flow does not expect"""
+
+def classify_failure(error):
+    """Sort an exception from the flow into one of the FAILURE_RECOVERY kinds"""
+    if isinstance(error, SessionExpired):
+        return 'session_expired'
+    if isinstance(error, SiteError):
+        return 'site_error'
+    if isinstance(error, PlaywrightTimeoutError):
+        return 'timeout'
+    message = str(error)
+    if any(text in message for text in ('has been closed', 'Target closed', 'crashed', 'not connected')):
+        return 'broken'
+    if 'net::' in message or 'Navigation' in message or 'navigating' in message:
+        return 'navigation'
+    return 'unknown'
+
+class RetryPolicy:
+    """Jittered exponential backoff with a circuit breaker, one per watched patient.
+
+    After circuit_breaker_failures consecutive failures the circuit opens and
+    the next attempt waits the whole cooldown; a success closes it again.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.failures = 0
+
+    @property
+    def circuit_open(self):
+        return self.failures >= self.settings['circuit_breaker_failures']
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self):
+        """Count a failure and return how long to wait before the next attempt, in seconds"""
+        self.failures += 1
+        if self.circuit_open:
+            return self.settings['circuit_breaker_cooldown_ms'] / 1000
+        ceiling = min(self.settings['retry_max_ms'], self.settings['retry_base_ms'] * 2 ** (self.failures - 1))
+        return random.uniform(ceiling / 2, ceiling) / 1000
+
+    def recovery_step(self, kind, failed_step='poll'):
+        """Step to restart from, moving earlier when the same watch keeps failing.
+
+        Never later than failed_step, the step that was running: a timeout
+        while filling the form has to fill it again, not search on it.
+        """
+        step = RECOVERY_STEPS.index(FAILURE_RECOVERY[kind])
+        escalations = (self.failures - 1) // max(1, self.settings['escalate_after_failures'])
+        step = max(1, min(step, len(RECOVERY_STEPS) - 1 - escalations))
+        return RECOVERY_STEPS[min(step, RECOVERY_STEPS.index(failed_step))]
+
+class PollScheduler:
+    """Chooses the pause before the next search.
+
+    Every detection of new slots is remembered in release_history_file. Once
+    there are enough of them, the pause shrinks in the hours (of the day and
+    of the week) when slots were released before and grows in the others,
+    and drops to the minimum within release_window_min of the time of day of
+    two past releases. Slow or failing searches stretch it back out.
+    """
+
+    MIN_HISTORY = 5  # Detections needed before the history is trusted
+    MAX_HISTORY = 2000
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.history = self.load_history()
+        self.fast_latency = None  # Short and long moving averages of the search duration
+        self.slow_latency = None
+        self.error_rate = 0.0  # Moving average of failed searches
+
+    def load_history(self):
+        try:
+            with open(self.settings['release_history_file'], 'r') as f:
+                return [datetime.fromisoformat(stamp) for stamp in json.load(f)]
+        except (FileNotFoundError, ValueError, TypeError):
+            return []
+
+    def record_release(self, when=None):
+        when = when or datetime.now()
+        if self.history and abs((when - self.history[-1]).total_seconds()) < 60:
+            return  # The same release seen by another patient or variant
+        self.history.append(when)
+        self.history = self.history[-self.MAX_HISTORY:]
+        try:
+            with open(self.settings['release_history_file'], 'w') as f:
+                json.dump([stamp.isoformat(timespec='seconds') for stamp in self.history], f)
+        except OSError:
+            pass
+
+    def record_poll(self, seconds=None, ok=True):
+        """Feed back the duration of a search, or a failed one"""
+        self.error_rate = 0.9 * self.error_rate + (0.0 if ok else 0.1)
+        if seconds is not None:
+            self.fast_latency = seconds if self.fast_latency is None else 0.7 * self.fast_latency + 0.3 * seconds
+            self.slow_latency = seconds if self.slow_latency is None else 0.98 * self.slow_latency + 0.02 * seconds
+
+    def release_score(self, now):
+        """How likely a release is at now compared to an average hour (1.0), from the history"""
+        if len(self.history) < self.MIN_HISTORY:
+            return 1.0
+        minute = now.hour * 60 + now.minute
+        window = self.settings['release_window_min']
+        close = sum(1 for stamp in self.history if abs((stamp.hour * 60 + stamp.minute - minute + 720) % 1440 - 720) <= window)
+        if close >= 2:
+            return float('inf')
+        total = len(self.history)
+        # Same hour of the day (neighbours count half) and same hour of the same weekday
+        hourly = sum(
+            weight for stamp in self.history
+            for offset, weight in ((0, 1.0), (1, 0.5), (-1, 0.5))
+            if stamp.hour == (now.hour + offset) % 24
+        ) / 2 * 24 / total
+        weekly = sum(1 for stamp in self.history if stamp.weekday() == now.weekday() and stamp.hour == now.hour) * 168 / total
+        return 0.7 * hourly + 0.3 * weekly
+
+    def next_interval(self, now=None):
+        """Pause before the next search, in seconds"""
+        base = self.settings['poll_interval_ms']
+        if not self.settings['adaptive_polling']:
+            return base / 1000
+        low = self.settings['poll_interval_min_ms']
+        high = self.settings['poll_interval_max_ms']
+        score = self.release_score(now or datetime.now())
+        interval = low if score == float('inf') else base / min(max(score, 0.05), 20)
+        # Back off while the site answers slower than usual or fails
+        if self.fast_latency and self.slow_latency:
+            interval *= max(1.0, self.fast_latency / self.slow_latency)
+        interval *= (1 + 4 * self.error_rate) * random.uniform(0.9, 1.1)
+        return min(max(interval, low), high) / 1000
+
+class Metrics:
+    """Timings and counters of a search, read by the GUI and the metrics endpoint.
+
+    Durations keep their last samples for the p50/p95 summaries. When
+    trace_file is set every observation is also appended to it as one JSON line.
+    """
+
+    SAMPLES = 500
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.durations = {}  # (name, labels) -> count, total and max in seconds, recent samples
+        self.counters = {}  # (name, labels) -> value
+        self.trace = None
+        self.server = None
+
+    def start(self):
+        if self.settings['trace_file']:
+            self.trace = open(self.settings['trace_file'], 'a', encoding='utf-8')
+        if self.settings['metrics_port']:
+            self.serve(self.settings['metrics_port'])
+
+    def close(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        with self.lock:
+            if self.trace:
+                self.trace.close()
+                self.trace = None
+
+    def serve(self, port):
+        """Expose the metrics in the Prometheus text format from a daemon thread"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def observe(self, name, seconds, **labels):
+        """Record a duration in seconds"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            stats = self.durations.get(key)
+            if stats is None:
+                stats = self.durations[key] = {'count': 0, 'total_s': 0.0, 'max_s': 0.0, 'samples': deque(maxlen=self.SAMPLES)}
+            stats['count'] += 1
+            stats['total_s'] += seconds
+            stats['max_s'] = max(stats['max_s'], seconds)
+            stats['samples'].append(seconds)
+            self.write_trace('timing', name, round(seconds, 4), labels)
+
+    def count(self, name, value=1, **labels):
+        """Add value to a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self.write_trace('count', name, value, labels)
+
+    def write_trace(self, event, name, value, labels):
+        if self.trace:
+            line = {'ts': round(time.time(), 3), 'event': event, 'name': name, 'value': value}
+            line.update(labels)
+            self.trace.write(json.dumps(line, ensure_ascii=False) + '\n')
+
+    @staticmethod
+    def percentile(samples, q):
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    def summary(self, name, label=None):
+        """Count, average, max, p50 and p95 of a duration, by value of label if given"""
+        with self.lock:
+            items = [(dict(labels).get(label), stats) for (key, labels), stats in self.durations.items() if key == name]
+            return {
+                value: {
+                    'count': stats['count'],
+                    'avg_s': round(stats['total_s'] / stats['count'], 3),
+                    'max_s': round(stats['max_s'], 3),
+                    'p50_s': round(self.percentile(stats['samples'], 0.5), 3),
+                    'p95_s': round(self.percentile(stats['samples'], 0.95), 3),
+                }
+                for value, stats in items
+            }
+
+    def total(self, name):
+        with self.lock:
+            return sum(value for (key, _), value in self.counters.items() if key == name)
+
+    def status_line(self):
+        """One line for the GUI: poll percentiles, polls per hour and errors"""
+        poll = self.summary('poll').get(None)
+        if not poll:
+            return ''
+        hours = max(time.time() - self.started, 60) / 3600
+        return (f"Poll p50 {poll['p50_s']:.1f} s, p95 {poll['p95_s']:.1f} s, "
+                f"{self.total('polls') / hours:.0f} polls/h, {self.total('errors')} errors")
+
+    def prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        def series(name, labels, extra=()):
+            pairs = [f'{key}="{str(value)}"' for key, value in list(labels) + list(extra)]
+            return f"meulade_{name}{{{','.join(pairs)}}}" if pairs else f"meulade_{name}"
+
+        lines = []
+        with self.lock:
+            for name in sorted({key for key, _ in self.counters}):
+                lines.append(f"# TYPE meulade_{name}_total counter")
+                for (key, labels), value in sorted(self.counters.items()):
+                    if key == name:
+                        lines.append(f"{series(name + '_total', labels)} {value}")
+            for name in sorted({key for key, _ in self.durations}):
+                lines.append(f"# TYPE meulade_{name}_seconds summary")
+                for (key, labels), stats in sorted(self.durations.items(), key=lambda item: item[0]):
+                    if key != name:
+                        continue
+                    for q in (0.5, 0.95):
+                        lines.append(f"{series(name + '_seconds', labels, [('quantile', q)])} {self.percentile(stats['samples'], q):.4f}")
+                    lines.append(f"{series(name + '_seconds_sum', labels)} {stats['total_s']:.4f}")
+                    lines.append(f"{series(name + '_seconds_count', labels)} {stats['count']}")
+        lines.append(f"meulade_uptime_seconds {time.time() - self.started:.0f}")
+        return '\n'.join(lines) + '\n'
+
+class HistoryStore:
+    """Every poll and the slots it saw, kept in a SQLite database for --report.
+
+    record_poll() only queues a row, a background thread writes them in
+    batches (one transaction per FLUSH_S) so the search never waits on the
+    disk. The database runs in WAL mode, so a report can read it while a
+    search is writing.
+    """
+
+    FLUSH_S = 1.0
+    MAX_BATCH = 500
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS polls (
+            id INTEGER PRIMARY KEY,
+            polled_at REAL NOT NULL,
+            profile TEXT NOT NULL,
+            variant TEXT NOT NULL,
+            outcome TEXT NOT NULL,
+            latency_s REAL,
+            slots INTEGER NOT NULL DEFAULT 0,
+            new_slots INTEGER NOT NULL DEFAULT 0,
+            error TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS polls_polled_at ON polls (polled_at);
+        CREATE INDEX IF NOT EXISTS polls_profile ON polls (profile, polled_at);
+        CREATE TABLE IF NOT EXISTS slots (
+            poll_id INTEGER NOT NULL REFERENCES polls (id),
+            seen_at REAL NOT NULL,
+            clinic TEXT NOT NULL,
+            slot_date TEXT NOT NULL,
+            slot_time TEXT NOT NULL,
+            professional TEXT NOT NULL,
+            distance_km REAL,
+            new INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS slots_seen_at ON slots (seen_at);
+        CREATE INDEX IF NOT EXISTS slots_clinic ON slots (clinic, seen_at);
+    """
+
+    def __init__(self, settings):
+        self.path = settings['history_db']
+        self.queue = queue.Queue()
+        self.thread = None
+
+    @staticmethod
+    def connect(path):
+        connection = sqlite3.connect(path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(HistoryStore.SCHEMA)
+        return connection
+
+    def start(self):
+        if self.path:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def close(self):
+        """Write everything still queued, then stop the thread"""
+        if self.thread:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def record_poll(self, profile, variant, outcome, latency=None, slots=(), new_slots=(), error=''):
+        """Queue one poll: outcome is 'slots', 'none', 'unknown' or 'error'"""
+        if self.path:
+            self.queue.put((time.time(), profile, variant, outcome, latency, list(slots), set(new_slots), error))
+
+    def run(self):
+        try:
+            connection = self.connect(self.path)
+        except sqlite3.Error as e:
+            print(f"Warning: Could not open {self.path}: {str(e)}")
+            while self.queue.get() is not None:
+                pass  # Drop the rows, but keep close() from blocking
+            return
+        closing = False
+        while not closing:
+            batch = []
+            item = self.queue.get()
+            deadline = time.monotonic() + self.FLUSH_S
+            while item is not None:
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                # Only take a row off the queue when the batch has room for it
+                if remaining <= 0 or len(batch) >= self.MAX_BATCH:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            closing = item is None
+            try:
+                self.write(connection, batch)
+            except sqlite3.Error as e:
+                print(f"Warning: Could not write {self.path}: {str(e)}")
+        connection.close()
+
+    @staticmethod
+    def write(connection, batch):
+        with connection:
+            for polled_at, profile, variant, outcome, latency, slots, new_slots, error in batch:
+                poll_id = connection.execute(
+                    'INSERT INTO polls (polled_at, profile, variant, outcome, latency_s, slots, new_slots, error)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (polled_at, profile, variant, outcome, latency, len(slots), len(new_slots), error)
+                ).lastrowid
+                connection.executemany(
+                    'INSERT INTO slots (poll_id, seen_at, clinic, slot_date, slot_time, professional, distance_km, new)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    [
+                        (poll_id, polled_at, slot.clinic, slot.date, slot.time, slot.professional, slot.distance_km, slot in new_slots)
+                        for slot in slots if slot != UNKNOWN_SLOT
+                    ]
+                )
+
+HEATMAP_SHADES = ' .:-=+*#%@'
+WEEKDAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+def heatmap_lines(rows, label_width):
+    """Text heatmap of (label, 24 hourly counts) rows, shaded against the largest count"""
+    top = max((max(counts) for _, counts in rows), default=0) or 1
+    lines = [(" " * (label_width + 2) + ''.join(f"{hour:<3d}" for hour in range(24))).rstrip()]
+    for label, counts in rows:
+        cells = ''.join(
+            f"{HEATMAP_SHADES[max(1, round(count / top * (len(HEATMAP_SHADES) - 1)))] if count else ' '}  "
+            for count in counts
+        )
+        lines.append(f"{label[:label_width]:<{label_width}}  {cells}  {sum(counts)}")
+    return lines
+
+def history_report(path, days=30):
+    """Text report of the history database: when new slots appear, where, and what the polling costs.
+
+    Everything is counted by SQLite, so the size of the report does not
+    grow with the number of polls.
+    """
+    if not path:
+        return ["settings.history_db is empty, no history is kept."]
+    if not os.path.exists(path):
+        return [f"No history in {path} yet, it fills up while searching."]
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    since = time.time() - days * 86400
+    local = "'unixepoch', 'localtime'"
+    try:
+        count, first, last = connection.execute(
+            'SELECT COUNT(*), MIN(polled_at), MAX(polled_at) FROM polls WHERE polled_at >= ?', (since,)
+        ).fetchone()
+        if not count:
+            return [f"No poll recorded in the last {days} days."]
+        # strftime('%w') counts from Sunday
+        hits = connection.execute(
+            f"SELECT (CAST(strftime('%w', polled_at, {local}) AS INTEGER) + 6) % 7,"
+            f" CAST(strftime('%H', polled_at, {local}) AS INTEGER), COUNT(*)"
+            ' FROM polls WHERE polled_at >= ? AND new_slots > 0 GROUP BY 1, 2',
+            (since,)
+        ).fetchall()
+        clinics = connection.execute(
+            'SELECT clinic, COUNT(*), MIN(distance_km), MAX(seen_at) FROM slots'
+            ' WHERE seen_at >= ? AND new GROUP BY clinic ORDER BY COUNT(*) DESC LIMIT 15',
+            (since,)
+        ).fetchall()
+        clinic_hours = connection.execute(
+            f"SELECT clinic, CAST(strftime('%H', seen_at, {local}) AS INTEGER), COUNT(*) FROM slots"
+            ' WHERE seen_at >= ? AND new GROUP BY 1, 2',
+            (since,)
+        ).fetchall()
+        profiles = connection.execute(
+            "SELECT profile, COUNT(*), SUM(new_slots > 0), SUM(outcome = 'error'), SUM(latency_s IS NOT NULL)"
+            ' FROM polls WHERE polled_at >= ? GROUP BY profile ORDER BY profile',
+            (since,)
+        ).fetchall()
+        medians = {}
+        for profile, _, _, _, timed in profiles:
+            if timed:
+                medians[profile] = connection.execute(
+                    'SELECT latency_s FROM polls WHERE profile = ? AND polled_at >= ? AND latency_s IS NOT NULL'
+                    ' ORDER BY latency_s LIMIT 1 OFFSET ?',
+                    (profile, since, (timed - 1) // 2)
+                ).fetchone()[0]
+    finally:
+        connection.close()
+
+    lines = [f"{count} polls between {datetime.fromtimestamp(first):%Y-%m-%d %H:%M} and {datetime.fromtimestamp(last):%Y-%m-%d %H:%M}", '']
+
+    grid = [[0] * 24 for _ in WEEKDAY_NAMES]
+    for weekday, hour, hit_count in hits:
+        grid[weekday][hour] = hit_count
+    lines.append("Polls that found new slots, by weekday and hour (darker is more):")
+    lines.extend(heatmap_lines(list(zip(WEEKDAY_NAMES, grid)), 3))
+    lines.append('')
+
+    if clinics:
+        lines.append("Clinics with the most new slots:")
+        for clinic, slot_count, distance, last_seen in clinics:
+            where = f", {distance:g} km" if distance is not None else ''
+            lines.append(f"  {clinic or '(unknown)'}: {slot_count}{where}, last {datetime.fromtimestamp(last_seen):%Y-%m-%d %H:%M}")
+        lines.append('')
+        by_clinic = {clinic: [0] * 24 for clinic, _, _, _ in clinics}
+        for clinic, hour, slot_count in clinic_hours:
+            if clinic in by_clinic:
+                by_clinic[clinic][hour] = slot_count
+        lines.append("New slots of those clinics by hour:")
+        lines.extend(heatmap_lines([(clinic or '(unknown)', counts) for clinic, counts in by_clinic.items()], 24))
+        lines.append('')
+
+    lines.append("Poll efficiency:")
+    for profile, polls, found, errors, _ in profiles:
+        line = f"  {profile or 'default'}: {polls} polls, {found} with new slots"
+        line += f", {polls / found:.0f} polls per hit" if found else ", no hit yet"
+        line += f", {errors / polls:.1%} errors"
+        if profile in medians:
+            line += f", p50 {medians[profile]:.2f} s"
+        lines.append(line)
+    return lines
+
+class FlowRunner:
+    """Runs a declarative flow (see flow.json) on a page and times every step.
+
+    Steps run in file order unless they name a "next" step. A "branch" step
+    waits for the first of its cases to show up, sets the case variables and
+    jumps to its "next" step. A step with a "when" condition only runs when
+    that flow variable is true ("!name" for false). "{name}" in any string is
+    replaced by the flow variable of that name (patient fields included).
+    """
+
+    ACTIONS = ('goto', 'click', 'submit', 'fill', 'select', 'check', 'wait_for', 'branch')
+
+    def __init__(self, flow, submit):
+        self.flow = flow
+        self.submit = submit
+        self.steps = {}
+        self.order = []
+        for step in flow['steps']:
+            if step['name'] in self.steps:
+                raise ValueError(f"Duplicate flow step '{step['name']}'")
+            if step.get('action') not in self.ACTIONS:
+                raise ValueError(f"Unknown action '{step.get('action')}' in flow step '{step['name']}'")
+            self.steps[step['name']] = step
+            self.order.append(step['name'])
+
+        targets = [flow.get('resume_from'), flow.get('variant_from'), flow.get('booking_from')]
+        for step in flow['steps']:
+            targets.append(step.get('next'))
+            targets.extend(case.get('next') for case in step.get('cases', []))
+        for target in targets:
+            if target and target not in self.steps:
+                raise ValueError(f"Flow jumps to unknown step '{target}'")
+
+    @property
+    def search_button(self):
+        return self.flow['search_button']
+
+    @property
+    def resume_from(self):
+        return self.flow.get('resume_from')
+
+    @property
+    def variant_from(self):
+        return self.flow.get('variant_from')
+
+    @property
+    def booking_from(self):
+        return self.flow.get('booking_from')
+
+    @property
+    def hold_step(self):
+        """Booking step after which the slot is held for us"""
+        return self.flow.get('hold_step', 'wait_hold')
+
+    @property
+    def results_selector(self):
+        return self.flow.get('results_selector')
+
+    async def run(self, page, variables, log, timings, start=None):
+        """Run the flow from start (the first step by default) to its end.
+
+        The (step name, seconds) of every step that ran is appended to timings,
+        also when a step fails halfway.
+        """
+        variables = dict(self.flow.get('variables', {}), **variables)
+        name = start or self.order[0]
+        while name:
+            step = self.steps[name]
+            next_name = step.get('next', self.following(name))
+            if self.applies(step, variables):
+                if step.get('log'):
+                    log(f"[DEBUG] {step['log']}")
+                started = time.perf_counter()
+                try:
+                    next_name = await self.run_step(page, step, variables, log) or next_name
+                finally:
+                    timings.append((name, time.perf_counter() - started))
+            name = None if step.get('end') else next_name
+
+    def following(self, name):
+        index = self.order.index(name) + 1
+        return self.order[index] if index < len(self.order) else None
+
+    @staticmethod
+    def applies(step, variables):
+        condition = step.get('when')
+        if not condition:
+            return True
+        if condition.startswith('!'):
+            return not variables.get(condition[1:])
+        return bool(variables.get(condition))
+
+    @staticmethod
+    def expand(text, variables):
+        return VARIABLE_PATTERN.sub(lambda match: str(variables.get(match.group(1), match.group(0))), text)
+
+    async def run_step(self, page, step, variables, log):
+        """Run one step, returning the name of the step to jump to (if any)"""
+        action = step['action']
+        timeout = step.get('timeout_ms')
+        selector = self.expand(step.get('selector', ''), variables)
+
+        if action == 'goto':
+            await page.goto(self.expand(step['url'], variables), wait_until=step.get('wait_until', 'domcontentloaded'), timeout=timeout)
+        elif action == 'click':
+            await page.click(selector, timeout=timeout)
+        elif action == 'submit':
+            response = await self.submit(page, selector, timeout=timeout)
+            if response.status >= 500:
+                raise SiteError(f"HTTP {response.status} in flow step '{step['name']}'")
+        elif action == 'fill':
+            fields = step.get('fields') or {step['selector']: step['value']}
+            for field_selector, value in fields.items():
+                await page.fill(self.expand(field_selector, variables), self.expand(value, variables), timeout=timeout)
+        elif action == 'select':
+            value = self.expand(step['value'], variables)
+            if step.get('click_first'):
+                await page.click(selector, timeout=timeout)
+            try:
+                await page.select_option(selector, value, timeout=timeout)
+            except Exception:
+                if not step.get('fallback_js'):
+                    raise
+                try:
+                    await page.click(selector, timeout=timeout)
+                    await page.select_option(selector, value, timeout=timeout)
+                except Exception:
+                    await page.evaluate(
+                        '([selector, value]) => { document.querySelector(selector).value = value; }',
+                        [selector, value]
+                    )
+        elif action == 'check':
+            await page.check(selector, timeout=timeout)
+        elif action == 'wait_for':
+            await page.wait_for_selector(selector, state=step.get('state', 'visible'), timeout=timeout)
+        elif action == 'branch':
+            return await self.run_branch(page, step, variables, log)
+
+    async def run_branch(self, page, step, variables, log):
+        """Wait for the first case whose selector shows up, apply it and return its next step"""
+        error = step.get('error', f"No case of flow step '{step['name']}' matched")
+        locators = [page.locator(self.expand(case['selector'], variables)) for case in step['cases']]
+        any_case = locators[0]
+        for locator in locators[1:]:
+            any_case = any_case.or_(locator)
+        try:
+            await any_case.first.wait_for(state='visible', timeout=step.get('timeout_ms'))
+        except PlaywrightTimeoutError:
+            raise SiteError(error)
+
+        for case, locator in zip(step['cases'], locators):
+            if await locator.first.is_visible():
+                if case.get('log'):
+                    log(f"[DEBUG] {case['log']}")
+                variables.update(case.get('set', {}))
+                return case.get('next')
+        raise SiteError(error)
+
+class SearchVariant:
+    """One set of search criteria, watched in its own page of the patient's context"""
+
+    def __init__(self, variables, main=False):
+        self.variables = variables
+        self.main = main  # The main variant runs the full form flow, the others reuse its session
+        self.page = None
+        self.search_request = None  # Recorded search request, replayed in HTTP polling mode
+
+    @property
+    def label(self):
+        return ', '.join(f"{name}={value}" for name, value in self.variables.items()) or 'default'
+
+    def flow_variables(self, profile):
+        variables = dict(profile, **self.variables)
+        variables['variant'] = not self.main
+        return variables
+
+class Watch:
+    """One patient being watched: its browser context, search variants and polling state"""
+
+    def __init__(self, profile, log, variants, slot_ttl, slot_filter, trace_polls):
+        self.profile = profile
+        self.log = log
+        self.slot_index = SlotIndex(slot_ttl)
+        self.slot_filter = slot_filter  # Predicate telling the slots this patient cares about
+        self.saved_session = None
+        self.context = None
+        self.variants = [SearchVariant(variables, main=(i == 0)) for i, variables in enumerate(variants or [{}])]
+        self.bytes_received = 0  # Reset after every poll
+        self.poll_started = None  # perf_counter() when the current poll was sent
+        self.polls = 0  # Searches answered since the watch started
+        self.poll_interval = None  # Last pause announced in the log, in seconds
+        self.booked = False  # An appointment was booked, nothing left to watch
+        self.tracing = False  # A trace chunk of the context is being recorded
+        self.trace_dir = None  # Temp dir of the trace chunks of the previous polls
+        self.trace_chunks = deque(maxlen=max(trace_polls - 1, 0))
+        self.trace_count = 0  # Chunks written to trace_dir, picks the next file of the ring
+        self.console = deque(maxlen=200)  # Recent console messages and page errors
+
+    @property
+    def main(self):
+        return self.variants[0]
+
+    @property
+    def page(self):
+        return self.main.page
+
+class BrowserHost:
+    """Keeps the Playwright driver and the shared Chromium alive between searches.
+
+    Owns an asyncio loop on a daemon thread that every search runs on. warm()
+    starts the driver and the browser in the background while the user is
+    still filling in the form, and with keep=True release() leaves them up
+    after Stop so the next Start skips straight to the first request.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.playwright = None
+        self.browser = None
+        self.launch_args = None
+        self.lock = None
+
+    def ensure_loop(self):
+        if self.thread is None:
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self.thread.start()
+
+    def submit(self, coroutine):
+        """Schedule a coroutine on the host loop, returns a concurrent.futures.Future"""
+        self.ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine):
+        """Run a coroutine on the host loop and wait for it (from any other thread)"""
+        return self.submit(coroutine).result()
+
+    def warm(self, settings):
+        """Start the driver and, unless every patient has its own profile, the browser"""
+        async def warm_up():
+            await self.start_playwright()
+            if not settings['persistent_profile']:
+                await self.get_browser(get_launch_args(settings))
+
+        future = self.submit(warm_up())
+        future.add_done_callback(lambda done: done.exception() and print(f"Warning: Could not pre-warm the browser: {done.exception()}"))
+
+    async def start_playwright(self):
+        if self.playwright is None:
+            # Simplified path handling
+            playwright_paths = get_playwright_path()
+            if playwright_paths:
+                os.environ['PLAYWRIGHT_BROWSERS_PATH'] = playwright_paths['browser_path']
+            import_playwright()
+            self.playwright = await async_playwright().start()
+        return self.playwright
+
+    async def get_browser(self, launch_args):
+        """The shared browser, (re)launched if it died or the launch options changed"""
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            if self.browser and self.browser.is_connected() and self.launch_args == launch_args:
+                return self.browser
+            await self.close_browser()
+            await self.start_playwright()
+            self.browser = await self.playwright.chromium.launch(**launch_args)
+            self.launch_args = launch_args
+            return self.browser
+
+    async def close_browser(self):
+        if self.browser:
+            try:
+                await self.browser.close()
+            except Exception:
+                pass  # Already gone
+            self.browser = None
+
+    async def release(self, keep):
+        """End of a search: keep the browser warm, or shut everything down"""
+        if keep:
+            return
+        await self.close_browser()
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
+
+    def shutdown(self):
+        """Close the browser and the driver and stop the loop (when the app quits)"""
+        if self.thread is None:
+            return
+        try:
+            self.submit(self.release(keep=False)).result(timeout=10)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+        self.thread = None
+
+class SearchEngine:
+    """Searches for appointments for several patients with one shared Chromium.
+
+    Every patient gets an isolated browser context (own cookies and session),
+    and all of them are driven concurrently from a single asyncio loop, so
+    memory and CPU grow per context instead of per browser. A semaphore bounds
+    how many contexts may be busy with the browser at the same time.
+
+    stop() cancels the search task, which interrupts whatever it is waiting
+    for (a flow step, a search response, the pause between polls) at once.
+    """
+
+    def __init__(self, profiles, settings, log, host=None):
+        self.profiles = profiles
+        self.settings = settings
+        self.log = log
+        self.cancelled = threading.Event()
+        self.task = None
+        # A host passed in outlives this search and may keep the browser warm
+        self.owns_host = host is None
+        self.host = host or BrowserHost()
+        self.busy = None
+        self.playwright = None
+        self.launch_args = None
+        self.browser = None
+        self.flow = FlowRunner(load_flow(settings), self.click_and_wait_for_response)
+        self.metrics = Metrics(settings)
+        self.scheduler = PollScheduler(settings)
+        # Compiled up front so a bad rule fails before any context opens
+        self.slot_filters = []
+        for profile in profiles:
+            try:
+                self.slot_filters.append(compile_slot_filter(profile.get('slot_filters', settings['slot_filters'])))
+            except ValueError as e:
+                raise ValueError(f"slot_filters of {get_profile_label(profile)}: {e}") from None
+        self.auto_book_filter = compile_slot_filter(settings['auto_book_filters'])
+        self.notifier = Notifier(settings, log)
+        self.history = HistoryStore(settings)
+        self.evidence = EvidenceWriter(settings, EVIDENCE_DIRECTORIES)
+
+    def run(self):
+        """Blocking entry point, called from the search thread.
+
+        Returns once the search has stopped and the browser is released.
+        """
+        try:
+            self.host.run(self.run_async())
+        except concurrent.futures.CancelledError:
+            pass  # Stopped with stop()
+        finally:
+            if self.owns_host:
+                self.host.shutdown()
+
+    def is_running(self):
+        return not self.cancelled.is_set()
+
+    def stop(self):
+        """Stop the search from any thread, without waiting for it"""
+        self.cancelled.set()
+        if self.host.loop:
+            self.host.loop.call_soon_threadsafe(self.cancel_task)
+
+    def cancel_task(self):
+        if self.task:
+            self.task.cancel()
+
+    async def run_async(self):
+        if self.cancelled.is_set():
+            return
+        self.task = asyncio.current_task()
+        # Start the evidence writer, which creates the screenshots directories
+        self.evidence.start()
+        self.metrics.start()
+        self.notifier.start()
+        self.history.start()
+        os.makedirs(self.settings['session_dir'], exist_ok=True)
+
+        try:
+            self.log("[DEBUG] Starting browser automation...")
+            self.playwright = await self.host.start_playwright()
+            self.launch_args = get_launch_args(self.settings)
+            await self.ensure_browser()
+
+            self.busy = asyncio.Semaphore(max(1, int(self.settings['max_concurrent_profiles'])))
+            await asyncio.gather(*(
+                self.run_profile(profile, slot_filter)
+                for profile, slot_filter in zip(self.profiles, self.slot_filters)
+            ))
+        finally:
+            await self.host.release(keep=self.settings['prewarm_browser'] and not self.owns_host)
+            self.save_step_stats()
+            self.metrics.close()
+            self.notifier.close()
+            self.history.close()
+            self.evidence.close()
+
+    async def ensure_browser(self):
+        """Get the shared browser from the host, which relaunches it if it died.
+
+        Persistent profiles each bring their own browser process, so there is
+        nothing to launch for them.
+        """
+        if self.settings['persistent_profile']:
+            return
+        if self.browser and not self.browser.is_connected():
+            self.log("[DEBUG] Browser lost, relaunching...")
+        self.browser = await self.host.get_browser(self.launch_args)
+
+    def profile_logger(self, profile):
+        """Log function that tags messages with the patient when there are several"""
+        if len(self.profiles) == 1:
+            return self.log
+        label = get_profile_label(profile)
+        return lambda message: self.log(f"[{label}] {message}")
+
+    async def run_profile(self, profile, slot_filter):
+        """Supervise the watch of one patient until the search is stopped.
+
+        A failure never ends the watch: it is classified, and after a jittered
+        backoff the watch restarts from the nearest step that can fix it
+        (retry the poll, resume the session, new context, relaunch browser).
+        """
+        watch = Watch(
+            profile,
+            self.profile_logger(profile),
+            profile.get('search_variants', self.settings['search_variants']),
+            self.settings['slot_ttl_s'],
+            slot_filter,
+            self.settings['trace_buffer_polls']
+        )
+        log = watch.log
+        if len(watch.variants) > 1:
+            log(f"[DEBUG] Watching {len(watch.variants)} search variants in parallel pages...")
+        retry = RetryPolicy(self.settings)
+        step = 'context'
+        try:
+            while self.is_running() and not watch.booked:  # Check if we should continue running
+                try:
+                    if step == 'browser':
+                        await self.ensure_browser()
+                        step = 'context'
+                    if step == 'context':
+                        await self.close_context(watch)
+                        watch.saved_session = self.load_session(profile)
+                        await self.new_context(watch)
+                        step = 'session'
+                    if step == 'session':
+                        async with self.busy:
+                            await self.reopen_pages(watch)
+                        step = 'poll'
+
+                    async with self.busy:
+                        watch.poll_started = time.perf_counter()
+                        result = await self.poll_variants(watch)
+                        seconds = time.perf_counter() - watch.poll_started
+                    self.metrics.observe('poll', seconds)
+                    self.metrics.count('polls')
+                    self.scheduler.record_poll(seconds)
+                    retry.record_success()
+                    new_slots = await self.report(watch, result)
+                    self.history.record_poll(
+                        get_profile_label(profile),
+                        result.variant.label if result.variant else watch.main.label,
+                        result.state or 'unknown',
+                        seconds,
+                        result.slots,
+                        new_slots
+                    )
+                    self.report_usage(watch)
+                    watch.polls += 1
+                    if new_slots:
+                        await self.save_trace(watch, 'slot_found')
+                    else:
+                        await self.next_trace_chunk(watch)
+
+                    if not self.is_running():
+                        break
+
+                    interval = self.scheduler.next_interval()
+                    if watch.poll_interval is None or abs(interval - watch.poll_interval) > 0.25 * watch.poll_interval:
+                        log(f"[DEBUG] Searching every {interval:.0f} s")
+                        watch.poll_interval = interval
+                    await self.sleep(interval)
+
+                except asyncio.CancelledError:
+                    raise  # An Exception before Python 3.8, never a failure to retry
+                except Exception as e:
+                    kind = classify_failure(e)
+                    self.metrics.count('errors', kind=kind)
+                    self.scheduler.record_poll(ok=False)
+                    self.history.record_poll(get_profile_label(profile), watch.main.label, 'error', error=kind)
+                    log(f"Error during search ({kind}): {str(e)}")
+                    await self.error_screenshot(watch.page)
+                    await self.save_trace(watch, f"error_{kind}")
+                    delay = retry.record_failure()
+                    step = retry.recovery_step(kind, step)
+                    if kind == 'broken' and self.browser and not self.browser.is_connected():
+                        step = 'browser'
+                    if retry.circuit_open:
+                        log(f"[DEBUG] {retry.failures} failures in a row, pausing for {delay / 60:.0f} min...")
+                    else:
+                        log(f"[DEBUG] Retrying from the {step} step in {delay:.1f} s...")
+                    await self.sleep(delay)
+        finally:
+            await self.close_context(watch)
+            if watch.trace_dir:
+                shutil.rmtree(watch.trace_dir, ignore_errors=True)
+
+    def record_timings(self, timings):
+        for name, seconds in timings:
+            self.metrics.observe('step', seconds, step=name)
+
+    def save_step_stats(self):
+        """Write the per-step and per-poll timings, slowest average first"""
+        stats = self.metrics.summary('step', 'step')
+        poll = self.metrics.summary('poll').get(None)
+        if poll:
+            stats['poll'] = poll
+        summary = dict(sorted(stats.items(), key=lambda item: -item[1]['avg_s']))
+        try:
+            with open(self.settings['step_timings_file'], 'w') as f:
+                json.dump(summary, f, indent=4)
+        except OSError:
+            pass
+
+    async def run_flow(self, watch, variant, start=None):
+        """Run the form flow (or part of it) in the page of a variant and log how long it took"""
+        timings = []
+        try:
+            await self.flow.run(variant.page, variant.flow_variables(watch.profile), watch.log, timings, start=start)
+        finally:
+            self.record_timings(timings)
+        if timings:
+            slowest, seconds = max(timings, key=lambda timing: timing[1])
+            total = sum(seconds for _, seconds in timings)
+            watch.log(f"[DEBUG] Flow took {total:.1f} s, slowest step: {slowest} ({seconds:.1f} s)")
+
+    async def sleep(self, seconds):
+        """Sleep, but wake up early when the search is stopped"""
+        deadline = asyncio.get_running_loop().time() + seconds
+        while self.is_running():
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, 0.5))
+
+    async def close_context(self, watch):
+        if watch.context:
+            try:
+                await watch.context.close()
+            except Exception:
+                pass  # Already gone with a crashed browser
+        watch.context = None
+        watch.tracing = False
+        for variant in watch.variants:
+            variant.page = None
+            variant.search_request = None
+
+    def session_path(self, profile):
+        return os.path.join(self.settings['session_dir'], f"{get_profile_key(profile)}.json")
+
+    def load_session(self, profile):
+        """Saved session of a patient, or None if there is none"""
+        try:
+            with open(self.session_path(profile), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    async def save_session(self, context, page, profile):
+        """Save cookies, storage and the search page URL so a restart can skip the form"""
+        session = {
+            'storage_state': await context.storage_state(),
+            'search_url': page.url,
+            'saved_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        with open(self.session_path(profile), 'w') as f:
+            json.dump(session, f)
+
+    def forget_session(self, profile):
+        try:
+            os.remove(self.session_path(profile))
+        except FileNotFoundError:
+            pass
+
+    async def new_context(self, watch):
+        """Open the browser context of a patient, restoring its saved session"""
+        profile = watch.profile
+        session = watch.saved_session
+        watch.log("[DEBUG] Creating new context...")
+        if self.settings['persistent_profile']:
+            user_data_dir = os.path.join(self.settings['session_dir'], get_profile_key(profile))
+            context = await self.playwright.chromium.launch_persistent_context(
+                user_data_dir, user_agent=USER_AGENT, **self.launch_args
+            )
+            # Chromium drops session cookies on exit, so restore them from the saved state
+            if session:
+                await context.add_cookies(session['storage_state']['cookies'])
+            page = context.pages[0] if context.pages else await context.new_page()
+        else:
+            context = await self.browser.new_context(
+                user_agent=USER_AGENT,
+                storage_state=session['storage_state'] if session else None
+            )
+            page = await context.new_page()
+        watch.context = context
+        await self.setup_context(watch)
+        self.setup_page(watch, watch.main, page)
+        await self.start_tracing(watch)
+
+    async def setup_context(self, watch):
+        """Install the request filter and transfer accounting on a new context"""
+        if self.settings['block_resource_types'] or self.settings['blocked_hosts'] or self.settings['block_third_party']:
+            await watch.context.route('**/*', self.filter_request)
+
+        async def count_bytes(request):
+            try:
+                sizes = await request.sizes()
+            except Exception:
+                return
+            watch.bytes_received += sizes['responseBodySize'] + sizes['responseHeadersSize']
+            self.metrics.count('requests', source='browser')
+
+        watch.context.on('requestfinished', count_bytes)
+
+    async def filter_request(self, route):
+        """Abort resources the search does not need, let everything else through"""
+        request = route.request
+        host = urlparse(request.url).hostname or ''
+        if (request.resource_type in self.settings['block_resource_types']
+                or host_matches(host, self.settings['blocked_hosts'])
+                or (self.settings['block_third_party'] and not host_matches(host, self.settings['allowed_hosts']))):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def setup_page(self, watch, variant, page):
+        page.set_default_timeout(self.settings['step_timeout_ms'])
+        page.set_default_navigation_timeout(self.settings['navigation_timeout_ms'])
+        # Kept for the traces, next to the console of the trace viewer
+        page.on('console', lambda message: watch.console.append(
+            f"{datetime.now():%H:%M:%S} [{variant.label}] {message.type}: {message.text}"
+        ))
+        page.on('pageerror', lambda error: watch.console.append(
+            f"{datetime.now():%H:%M:%S} [{variant.label}] pageerror: {error}"
+        ))
+        variant.page = page
+
+    async def start_tracing(self, watch):
+        """Start recording a Playwright trace of the context, one chunk per poll"""
+        if not self.settings['trace_buffer_polls']:
+            return
+        try:
+            # Starting the trace also starts its first chunk
+            await watch.context.tracing.start(snapshots=True, screenshots=self.settings['trace_screenshots'])
+        except Exception as e:
+            watch.log(f"[DEBUG] Could not start tracing: {str(e)}")
+            return
+        watch.tracing = True
+
+    async def next_trace_chunk(self, watch):
+        """End the trace chunk of a healthy poll and start the next one.
+
+        With trace_buffer_polls at 1 the chunk is dropped, otherwise it goes
+        to a ring of files in a temp dir that save_trace() picks up.
+        """
+        if not watch.tracing:
+            return
+        path = None
+        if watch.trace_chunks.maxlen:
+            watch.trace_dir = watch.trace_dir or tempfile.mkdtemp(prefix='meulade-trace-')
+            path = os.path.join(watch.trace_dir, f"chunk_{watch.trace_count % watch.trace_chunks.maxlen}.zip")
+        try:
+            await watch.context.tracing.stop_chunk(path=path)
+            if path:
+                watch.trace_chunks.append(path)
+                watch.trace_count += 1
+            await watch.context.tracing.start_chunk()
+        except Exception:
+            watch.tracing = False  # Back with the next context
+
+    async def save_trace(self, watch, reason):
+        """Queue the trace of the last polls and the console messages for writing to traces/"""
+        chunks = list(watch.trace_chunks)
+        watch.trace_chunks.clear()
+        if watch.tracing:
+            watch.trace_dir = watch.trace_dir or tempfile.mkdtemp(prefix='meulade-trace-')
+            current = os.path.join(watch.trace_dir, 'current.zip')
+            try:
+                await watch.context.tracing.stop_chunk(path=current)
+                chunks.append(current)
+                await watch.context.tracing.start_chunk()
+            except Exception:
+                watch.tracing = False  # The context broke, the previous chunks are all there is
+        if not chunks and not watch.console:
+            return
+        name = f"{reason}_{get_profile_key(watch.profile)}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        saved = None
+        for i, path in enumerate(chunks, 1):
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                continue
+            # The last chunk is the poll that failed or found slots
+            saved = self.evidence.submit("traces", name if i == len(chunks) else f"{name}_prev{len(chunks) - i}", data, 'zip') or saved
+        if watch.console:
+            self.evidence.submit("traces", name, '\n'.join(watch.console).encode('utf-8'), 'log')
+            watch.console.clear()
+        if saved:
+            watch.log(f"[DEBUG] Trace saved: {saved} (npx playwright show-trace {saved})")
+
+    async def start_session(self, watch):
+        """Get to the search page, resuming the saved session when it is still valid.
+
+        The full form flow only runs when there is no session or it has expired.
+        """
+        if watch.saved_session:
+            if await self.resume_session(watch):
+                return
+            self.forget_session(watch.profile)
+            watch.saved_session = None
+
+        await self.run_flow(watch, watch.main)
+        await self.save_session(watch.context, watch.page, watch.profile)
+        watch.saved_session = self.load_session(watch.profile)
+
+    async def reopen_pages(self, watch):
+        """Get every variant page back to the search page, opening those HTTP polling closed.
+
+        The main variant sets up the session, then the others open the search
+        page in the same context and only apply their own criteria.
+        """
+        for variant in watch.variants:
+            variant.search_request = None
+            if not variant.page:
+                self.setup_page(watch, variant, await watch.context.new_page())
+        await self.start_session(watch)
+        await asyncio.gather(*(self.open_variant(watch, variant) for variant in watch.variants[1:]))
+
+    async def open_search_page(self, page, url):
+        """Go to the search page of an existing session, False if it is not shown anymore"""
+        try:
+            await page.goto(url, wait_until='domcontentloaded')
+            await page.wait_for_selector(self.flow.search_button, state='visible', timeout=self.settings['resume_timeout_ms'])
+        except PlaywrightTimeoutError:
+            return False
+        return True
+
+    async def resume_session(self, watch):
+        watch.log("[DEBUG] Resuming saved session...")
+        if not await self.open_search_page(watch.page, watch.saved_session['search_url']):
+            watch.log("[DEBUG] Saved session expired, filling the form again...")
+            return False
+        if self.flow.resume_from:
+            await self.run_flow(watch, watch.main, start=self.flow.resume_from)
+        watch.log("[DEBUG] Session resumed on the search page")
+        return True
+
+    async def open_variant(self, watch, variant):
+        """Point an extra page of the shared session at the criteria of its variant"""
+        watch.log(f"[DEBUG] Opening search variant {variant.label}...")
+        if not await self.open_search_page(variant.page, watch.saved_session['search_url']):
+            raise SessionExpired("search page not shown for a variant")
+        await self.run_flow(watch, variant, start=self.flow.variant_from or self.flow.resume_from)
+
+    def is_search_response(self, response):
+        """Whether a response answers the search (or form) request we just sent"""
+        request = response.request
+        if request.resource_type not in ('document', 'xhr', 'fetch'):
+            return False
+        pattern = self.settings['search_url_pattern']
+        if pattern:
+            return re.search(pattern, request.url) is not None
+        return request.method == 'POST'
+
+    async def click_and_wait_for_response(self, page, selector, timeout=None):
+        """Click and return once the server has answered the request it triggered"""
+        async with page.expect_response(self.is_search_response, timeout=timeout) as response_info:
+            await page.click(selector, timeout=timeout)
+        return await response_info.value
+
+    async def poll_variants(self, watch):
+        """Search with every variant at once and merge their answers"""
+        watch.log("[DEBUG] Searching for slots...")
+        results = await asyncio.gather(*(
+            self.poll(watch, variant) if variant.page else self.http_poll(watch, variant)
+            for variant in watch.variants
+        ))
+        return merge_results(results)
+
+    async def poll(self, watch, variant):
+        """Run one search in the page of a variant and return its SearchResult.
+
+        Availability is read from the search response itself, so detection
+        happens as soon as the bytes arrive. The rendered page is only read
+        when the payload could not be understood.
+        """
+        page = variant.page
+        timeout = self.settings['search_timeout_ms']
+        await page.evaluate(ARM_RESULTS_JS)
+        response = await self.click_and_wait_for_response(page, self.flow.search_button, timeout=timeout)
+        if response.status >= 500:
+            raise SiteError(f"HTTP {response.status}")
+        try:
+            result = parse_search_response(await response.body(), response.headers.get('content-type', ''))
+        except Exception:
+            result = SearchResult()
+        result.variant = variant
+        if result.state is None:
+            handle = await page.wait_for_function(RESULTS_READY_JS, timeout=timeout)
+            result.state = await handle.json_value()
+        elif self.settings['http_polling']:
+            await self.switch_to_http(watch, variant, response.request)
+        return result
+
+    async def switch_to_http(self, watch, variant, request):
+        """Record the search request and close the page, later polls replay it over HTTP"""
+        headers = await request.all_headers()
+        variant.search_request = {
+            'url': request.url,
+            'method': request.method,
+            'headers': {
+                name: value for name, value in headers.items()
+                if not name.startswith(':') and name.lower() not in REPLAY_SKIPPED_HEADERS
+            },
+            'data': request.post_data_buffer,
+        }
+        await variant.page.close()
+        variant.page = None
+        watch.log(f"[DEBUG] Session ready, polling {variant.label} over HTTP...")
+
+    async def http_poll(self, watch, variant):
+        """Replay the recorded search request with the context's cookies.
+
+        Playwright's request context keeps the connection alive between polls.
+        Raises SessionExpired when the answer is a redirect, an auth error or
+        anything we cannot read, so the browser can renew the session.
+        """
+        request = variant.search_request
+        response = await watch.context.request.fetch(
+            request['url'],
+            method=request['method'],
+            headers=request['headers'],
+            data=request['data'],
+            timeout=self.settings['search_timeout_ms'],
+            max_redirects=0,
+        )
+        self.metrics.count('requests', source='http')
+        try:
+            if response.status >= 500:
+                raise SiteError(f"HTTP {response.status}")
+            if response.status in (301, 302, 303, 307, 401, 403, 440) or not response.ok:
+                raise SessionExpired(f"HTTP {response.status}")
+            result = parse_search_response(await response.body(), response.headers.get('content-type', ''))
+            if result.state is None:
+                raise SessionExpired("unreadable search response")
+            result.variant = variant
+            watch.bytes_received += result.size
+        finally:
+            await response.dispose()
+        return result
+
+    def report_usage(self, watch):
+        """Log the bytes of the last poll and the memory of the browser processes"""
+        self.metrics.count('bytes_received', watch.bytes_received)
+        message = f"[DEBUG] Poll used {watch.bytes_received / 1024:.1f} KB"
+        rss = process_tree_rss()
+        if rss is not None:
+            message += f", browser RSS {rss / (1024 * 1024):.0f} MB"
+        watch.log(message)
+        watch.bytes_received = 0
+
+    async def report(self, watch, result):
+        """Tell the user about the outcome of one search.
+
+        Only slots that match the slot filters and are new (or changed) since
+        the last polls beep, get a screenshot and show up in the log. Returns
+        those new slots.
+        """
+        log = watch.log
+        new_slots = []
+        if result.state == 'none':
+            log("[DEBUG] No slots available")
+        elif result.state == 'slots':
+            slots = result.slots or [UNKNOWN_SLOT]
+            matching = [slot for slot in slots if watch.slot_filter(slot)]
+            if not matching:
+                log(f"[DEBUG] {len(slots)} slot(s), none matching the filters")
+                return new_slots
+            new_slots = watch.slot_index.update(matching)
+            if not new_slots:
+                log("[DEBUG] Same slots as before")
+                return new_slots
+
+            # Time from sending the search to knowing about the new slots
+            detected = time.perf_counter()
+            self.metrics.observe('detection', detected - watch.poll_started)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            # Fast path first: every millisecond counts to hold the slot
+            booking = self.booking_target(new_slots) if self.settings['auto_book'] else None
+            left_results = False
+            if booking:
+                # Booking replaces the results on the page, keep the response that listed the slot
+                if result.body:
+                    self.evidence.submit("screenshots", f"slot_found_{timestamp}", result.body, 'html')
+                booking_variant = result.slot_variants.get(booking) or result.variant or watch.main
+                left_results = await self.book(watch, booking_variant, booking, detected)
+            self.metrics.count('slots_found', len(new_slots))
+            if watch.polls:
+                # Slots already there at the first search were not released just now
+                self.scheduler.record_release()
+            log("🎉 SLOT FOUND! 🎉")
+            if len(watch.variants) > 1 and result.variant:
+                log(f"Search variant: {result.variant.label}")
+            clinics = SearchResult(slots=new_slots).clinics
+            for clinic, count in clinics.items():
+                if clinic:
+                    log(f"{clinic}: {count} new slot(s)")
+            patient = get_profile_label(watch.profile)
+            self.notifier.notify(
+                f"Appointment booked for {patient}" if watch.booked else f"Appointment slot found for {patient}",
+                ', '.join(f"{clinic}: {count}" for clinic, count in clinics.items() if clinic) or "Open the RVSQ site to book",
+                patient=patient,
+                variant=result.variant.label if result.variant else '',
+                slots=[asdict(slot) for slot in new_slots if slot != UNKNOWN_SLOT],
+            )
+
+            if left_results:
+                page = booking_variant.page  # Shows the hold or the confirmation
+            else:
+                page = result.variant.page if result.variant else watch.page
+            if page:
+                screenshot_path = await self.capture(page, "screenshots", f"slot_found_{timestamp}", self.flow.results_selector)
+            else:
+                # No page in HTTP polling mode, keep the search response instead
+                screenshot_path = self.evidence.submit("screenshots", f"slot_found_{timestamp}", result.body, 'html')
+            if screenshot_path:
+                log(f"Screenshot saved: {screenshot_path}")
+            if left_results and not watch.booked:
+                # Back to the search page for the next polls
+                await self.reopen_pages(watch)
+        return new_slots
+
+    def booking_target(self, slots):
+        """First slot worth booking automatically, or None"""
+        for slot in slots:
+            # Nothing to click without the time
+            if slot.time and self.auto_book_filter(slot):
+                return slot
+        return None
+
+    async def book(self, watch, variant, slot, detected):
+        """Run the booking steps of the flow on the page that showed slot.
+
+        The page is already on the results, so the first step clicks the
+        slot straight away. The time from detection to the slot being held
+        (the end of the flow's hold_step) is logged. Returns whether the page
+        left the results, the caller brings it back once it has its evidence.
+        """
+        log = watch.log
+        page = variant.page
+        if not self.flow.booking_from:
+            log("[DEBUG] Auto-booking skipped, the flow has no booking steps")
+            return False
+        if not page:
+            log("[DEBUG] Auto-booking skipped, no page in HTTP polling mode")
+            return False
+
+        dry_run = self.settings['auto_book_dry_run']
+        variables = dict(variant.flow_variables(watch.profile), dry_run=dry_run, **asdict(slot))
+        started = time.perf_counter()
+        timings = []
+        completed = False
+        log(f"Booking {slot.clinic} {slot.date} {slot.time}{' (dry run)' if dry_run else ''}...")
+        try:
+            await self.flow.run(page, variables, log, timings, start=self.flow.booking_from)
+            completed = True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log(f"Auto-booking failed: {e}")
+        finally:
+            self.record_timings(timings)
+
+        names = [name for name, _ in timings]
+        if self.flow.hold_step in names:
+            held = started - detected + sum(seconds for _, seconds in timings[:names.index(self.flow.hold_step) + 1])
+            self.metrics.observe('hold', held)
+            log(f"Slot held {held * 1000:.0f} ms after detection")
+        if completed and not dry_run:
+            watch.booked = True
+            log("✅ Appointment booked!")
+        elif completed:
+            log("[DEBUG] Dry run, the slot was not confirmed")
+        return True
+
+    async def capture(self, page, directory, name, selector=None):
+        """Screenshot the element matching selector (or the page) and queue it for writing.
+
+        Returns the path the image will be written to, or None when it is
+        identical to one already saved.
+        """
+        image_format = self.settings['capture_format']
+        quality = self.settings['capture_quality']
+        convert = None
+        if image_format == 'webp' and optional_module('PIL.Image') is not None:
+            options = {'type': 'png'}
+            extension = 'webp'
+            convert = lambda data: to_webp(data, quality)
+        elif image_format == 'png':
+            options = {'type': 'png'}
+            extension = 'png'
+        else:
+            options = {'type': 'jpeg', 'quality': quality}
+            extension = 'jpg'
+
+        data = None
+        if selector:
+            try:
+                data = await page.locator(selector).first.screenshot(timeout=1000, **options)
+            except Exception:
+                data = None
+        if data is None:
+            data = await page.screenshot(full_page=self.settings['capture_full_page'], **options)
+        return self.evidence.submit(directory, name, data, extension, convert)
+
+    async def error_screenshot(self, page):
+        if not page:
+            return
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        try:
+            await self.capture(page, "error_screenshots", f"error_{timestamp}")
+        except Exception:
+            pass  # The page may be what broke
+
+def text_script(text):
+    """'hindi', 'chinese' or 'latin', whichever font the text needs"""
+    if any('\u0900' <= char <= '\u097f' for char in text):  # Hindi characters
+        return 'hindi'
+    if any('\u4e00' <= char <= '\u9fff' for char in text):  # Chinese characters
+        return 'chinese'
+    return 'latin'
+
+class FontRegistry:
+    """Loads each (script, size) font once.
+
+    SysFont takes the first installed font of the comma-separated list, with
+    arial unicode ms as the last resort for every script.
+    """
+
+    FONTS = {
+        'latin': 'segoe ui,arial unicode ms',
+        'chinese': 'simsun,arial unicode ms',
+        'hindi': 'nirmala ui,mangal,aparajita,arial unicode ms',
+    }
+
+    def __init__(self):
+        self.fonts = {}
+
+    def get(self, script, size):
+        font = self.fonts.get((script, size))
+        if font is None:
+            try:
+                font = pygame.font.SysFont(self.FONTS[script], size)
+            except Exception:
+                font = pygame.font.SysFont('arial unicode ms', size)
+            self.fonts[(script, size)] = font
+        return font
+
+class TextCache:
+    """LRU cache of rendered text surfaces keyed by (text, color, size).
+
+    A steady frame renders the same labels over and over, so after the first
+    frame drawing text is a dictionary lookup.
+    """
+
+    def __init__(self, fonts, size=256):
+        self.fonts = fonts
+        self.size = size
+        self.surfaces = OrderedDict()
+
+    def render(self, text, color, font_size):
+        key = (text, tuple(color), font_size)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = self.fonts.get(text_script(text), font_size).render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
 class AppGUI:
     def __init__(self):
+        import_pygame()
         pygame.init()
         self.width = 500  # More compact width
         self.height = 700  # Increased from 600 to 700 to fit everything
@@ -40,36 +2481,8 @@ class AppGUI:
         self.INPUT_BORDER_ACTIVE = self.BLUE
         self.INPUT_SHADOW = (241, 245, 249)  # Tailwind slate-100
         
-        # Fonts with better international support
-        try:
-            # For Latin characters
-            self.latin_font = pygame.font.SysFont('segoe ui', 16)
-            # For Chinese characters
-            self.chinese_font = pygame.font.SysFont('simsun', 16)
-            # For Hindi characters - try multiple Hindi fonts
-            hindi_fonts = ['nirmala ui', 'mangal', 'aparajita']
-            self.hindi_font = None
-            for font_name in hindi_fonts:
-                try:
-                    self.hindi_font = pygame.font.SysFont(font_name, 16)
-                    test_text = self.hindi_font.render('हिंदी', True, (0, 0, 0))
-                    break
-                except:
-                    continue
-            if not self.hindi_font:
-                self.hindi_font = pygame.font.SysFont('arial unicode ms', 16)
-            
-            self.title_font = self.latin_font
-            self.main_font = self.latin_font
-            self.log_font = self.latin_font
-        except:
-            default_font = pygame.font.SysFont('arial unicode ms', 16)
-            self.latin_font = default_font
-            self.chinese_font = default_font
-            self.hindi_font = default_font
-            self.title_font = default_font
-            self.main_font = default_font
-            self.log_font = default_font
+        # Fonts are resolved once per (script, size), rendered texts are cached
+        self.text_cache = TextCache(FontRegistry())
         
         # Initialize translations first
         self.translations = {
@@ -385,17 +2798,31 @@ class AppGUI:
         self.cursor_timer = 0
         self.CURSOR_BLINK_TIME = 530  # milliseconds
         
-        # Status and logging with better positioning
+        # Status and logging with better positioning. The search thread never
+        # touches them: it posts to self.events and process_events() applies
+        # the events on the GUI thread.
         self.status = "Ready to start"
-        self.log_messages = []
+        self.log_messages = deque(maxlen=10)
+        self.events = queue.Queue()
+        self.logger = logging.getLogger('meulade')
+        self.logger.setLevel(logging.DEBUG)
+        settings = get_settings(load_config())
+        if settings['log_file']:
+            self.logger.addHandler(log_file_handler(settings['log_file'], settings))
+        self.metrics = None  # Metrics of the current (or last) search
+        self.engine = None  # SearchEngine of the running search, events of older ones are ignored
         
         self.active_field = None
         self.running = True
         self.search_running = False
+        self.search_stopping = False  # Stop was clicked, the engine is still tearing down
         
         # Load saved config
         self.load_saved_config()
         
+        # Playwright driver and browser, shared by every search of this window
+        self.browser_host = BrowserHost()
+        
         # Add URL rect for click detection
         self.url = "www.meulade.com"
         self.url_rect = None  # Will be set in draw method
@@ -403,60 +2830,109 @@ class AppGUI:
         # Add URL color and hover color
         self.URL_COLOR = (63, 131, 248)  # Same as self.BLUE
         self.URL_HOVER_COLOR = (29, 78, 216)  # Darker blue for hover
+        
+        # Redraw bookkeeping: draw() only repaints and pushes the dirty
+        # rectangles, and the search thread wakes the event loop with WAKE_EVENT
+        self.WAKE_EVENT = pygame.USEREVENT + 1
+        self.dirty = [self.screen.get_rect()]
+        self.hovered = None
+        self.metrics_rect = None
 
     def load_saved_config(self):
-        try:
-            with open('config.json', 'r') as f:
-                config = json.load(f)
-                personal_info = config['personal_info']
-                for field in self.fields:
-                    self.fields[field]['text'] = personal_info.get(field, '')
-        except FileNotFoundError:
-            pass
+        personal_info = load_config().get('personal_info', {})
+        for field in self.fields:
+            self.fields[field]['text'] = personal_info.get(field, '')
 
     def save_config(self):
-        config = {
-            "personal_info": {
-                field: self.fields[field]['text']
-                for field in self.fields
-            }
+        # Keep the roster and settings sections, only the form is edited here
+        config = load_config()
+        config["personal_info"] = {
+            field: self.fields[field]['text']
+            for field in self.fields
         }
         with open('config.json', 'w') as f:
             json.dump(config, f, indent=4)
 
     def log_message(self, message):
-        # Translate debug messages
-        if message.startswith("[DEBUG]"):
-            debug_key = message.lower().replace("[debug] ", "debug_")
-            translated_message = self.get_text(debug_key)
-            if translated_message != debug_key:  # If translation exists
-                message = f"[DEBUG] {translated_message}"
-        
-        self.log_messages.append(message)
-        if len(self.log_messages) > 10:
-            self.log_messages.pop(0)
+        """Log from any thread: written to the log file now, shown by the GUI thread"""
+        self.logger.log(logging.DEBUG if '[DEBUG]' in message else logging.INFO, message)
+        self.post_event('log', message)
+
+    def post_event(self, kind, value=None):
+        """Queue a 'log' or 'stopped' event for the GUI thread"""
+        self.events.put((kind, value))
+        try:
+            pygame.event.post(pygame.event.Event(self.WAKE_EVENT))
+        except pygame.error:
+            pass  # Event queue full or closed, the next wake-up drains ours anyway
+
+    def invalidate(self, *rects):
+        """Mark rectangles (the whole window if none) to be repainted by the next draw()"""
+        if not rects:
+            rects = [self.screen.get_rect()]
+        self.dirty.extend(pygame.Rect(rect) for rect in rects if rect)
+
+    def hover_target(self, pos):
+        """The hoverable rectangle under pos, or None"""
+        targets = [self.start_button, self.stop_button, self.url_rect, self.language_button]
+        if self.language_dropdown_open:
+            targets += [
+                pygame.Rect(self.dropdown_rect.x, self.dropdown_rect.y + i * 25, self.dropdown_rect.width, 25)
+                for i in range(len(self.languages))
+            ]
+        for rect in targets:
+            if rect and rect.collidepoint(pos):
+                return tuple(rect)
+        return None
+
+    def next_wakeup(self):
+        """How long the event loop may sleep, in milliseconds"""
+        if self.active_field:
+            elapsed = pygame.time.get_ticks() - self.cursor_timer
+            return max(1, self.CURSOR_BLINK_TIME - elapsed)
+        return 1000
+
+    def process_events(self):
+        """Apply the queued events, returns whether anything changed"""
+        changed = False
+        while True:
+            try:
+                kind, value = self.events.get_nowait()
+            except queue.Empty:
+                return changed
+            changed = True
+            if kind == 'log':
+                self.invalidate(self.log_rect, self.metrics_rect)
+                # Translate debug messages
+                if value.startswith("[DEBUG]"):
+                    debug_key = value.lower().replace("[debug] ", "debug_")
+                    translated_message = self.get_text(debug_key)
+                    if translated_message != debug_key:  # If translation exists
+                        value = f"[DEBUG] {translated_message}"
+                self.log_messages.append(value)
+            elif kind == 'stopped' and value is self.engine:
+                self.engine = None
+                self.search_running = False
+                self.search_stopping = False
+                self.status = "Ready to start"
+                self.invalidate(self.start_button, self.stop_button)
 
     def get_text(self, key):
         """Get translated text for current language"""
         return self.translations.get(self.current_language, self.translations['English']).get(key, key)
 
     def render_text(self, text, color, font_size=16):
-        """Render text with appropriate font based on content"""
-        try:
-            if any('\u0900' <= char <= '\u097f' for char in text):  # Hindi characters
-                font = pygame.font.SysFont('nirmala ui', font_size)
-            elif any('\u4e00' <= char <= '\u9fff' for char in text):  # Chinese characters
-                font = pygame.font.SysFont('simsun', font_size)
-            else:
-                font = pygame.font.SysFont('segoe ui', font_size)
-            
-            return font.render(text, True, color)
-        except:
-            # Fallback to arial unicode ms if specific font fails
-            fallback_font = pygame.font.SysFont('arial unicode ms', font_size)
-            return fallback_font.render(text, True, color)
+        """Render text with appropriate font based on content (cached, do not draw on the surface)"""
+        return self.text_cache.render(text, color, font_size)
 
     def draw(self):
+        """Repaint the dirty rectangles and push only those to the display"""
+        if not self.dirty:
+            return
+        # Painting the whole scene under a clip keeps every overlap right
+        # while only touching the pixels of the dirty area
+        self.screen.set_clip(self.dirty[0].unionall(self.dirty[1:]))
+        
         # Fill background
         self.screen.fill(self.WHITE)
         
@@ -520,7 +2996,8 @@ class AppGUI:
         for button, text in [(self.start_button, self.get_text('start')), 
                            (self.stop_button, self.get_text('stop'))]:
             is_start = button == self.start_button
-            is_enabled = (is_start and not self.search_running) or (not is_start and self.search_running)
+            # Start stays off until the stopped search has released the browser
+            is_enabled = (is_start and not self.search_running) or (not is_start and self.search_running and not self.search_stopping)
             is_hovered = button.collidepoint(pygame.mouse.get_pos())
             
             if is_enabled:
@@ -548,6 +3025,14 @@ class AppGUI:
         self.screen.blit(notification_text1, notification_rect1)
         self.screen.blit(notification_text2, notification_rect2)
         
+        # Poll timings of the running search, between the notification and the log
+        self.metrics_rect = pygame.Rect(0, notification_rect2.bottom, self.width, 18)
+        if self.metrics:
+            metrics_line = self.metrics.status_line()
+            if metrics_line:
+                metrics_text = self.render_text(metrics_line, self.BLACK, 12)
+                self.screen.blit(metrics_text, metrics_text.get_rect(centerx=self.width//2, y=notification_rect2.bottom + 2))
+        
         # Draw log area with more space below notification (adjusted for two lines)
         log_y = notification_rect2.bottom + 20  # Changed from notification_rect to notification_rect2
         self.log_rect = pygame.Rect(self.center_x, log_y, self.field_width, 80)
@@ -555,7 +3040,7 @@ class AppGUI:
         pygame.draw.rect(self.screen, self.GRAY, self.log_rect, 1, border_radius=6)
         
         # Draw log messages with subtle alternating backgrounds
-        for i, message in enumerate(self.log_messages[-8:]):  # Show only last 8 messages
+        for i, message in enumerate(list(self.log_messages)[-8:]):  # Show only last 8 messages
             y_pos = self.log_rect.y + 5 + i*20
             if i % 2 == 0:
                 row_rect = pygame.Rect(self.log_rect.x + 2, y_pos, self.log_rect.width - 4, 20)
@@ -633,12 +3118,25 @@ class AppGUI:
                 text_y = option_rect.y + (option_rect.height - lang_text.get_height()) // 2
                 self.screen.blit(lang_text, (option_rect.x + 8, text_y))
         
-        pygame.display.flip()
+        self.screen.set_clip(None)
+        pygame.display.update(self.dirty)
+        self.dirty = []
 
     def handle_event(self, event):
+        if event.type == pygame.MOUSEMOTION:
+            hovered = self.hover_target(event.pos)
+            if hovered != self.hovered:
+                # Inflated to cover the underline of the link and the button shadows
+                self.invalidate(*(pygame.Rect(rect).inflate(6, 6) for rect in (self.hovered, hovered) if rect))
+                self.hovered = hovered
+        elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.VIDEOEXPOSE, pygame.ACTIVEEVENT, pygame.VIDEORESIZE):
+            # Clicks may change focus, buttons, the dropdown or the language
+            self.invalidate()
+        
         if event.type == pygame.MOUSEBUTTONDOWN:
             # Handle URL click
             if self.url_rect and self.url_rect.collidepoint(event.pos):
+                import webbrowser
                 webbrowser.open(f"https://{self.url}")
             
             # Handle language selector
@@ -673,11 +3171,12 @@ class AppGUI:
             # Handle button clicks
             if self.start_button.collidepoint(event.pos) and not self.search_running:
                 self.start_search()
-            elif self.stop_button.collidepoint(event.pos) and self.search_running:
+            elif self.stop_button.collidepoint(event.pos) and self.search_running and not self.search_stopping:
                 self.stop_search()
         
         elif event.type == pygame.KEYDOWN:
             if self.active_field:
+                self.invalidate(self.fields[self.active_field]['rect'].inflate(4, 4))
                 if event.key == pygame.K_BACKSPACE:
                     self.fields[self.active_field]['text'] = self.fields[self.active_field]['text'][:-1]
                 else:
@@ -689,226 +3188,58 @@ class AppGUI:
             return
         
         self.save_config()
+        config = load_config()
+        profiles = get_profiles(config)
+        try:
+            engine = SearchEngine(
+                profiles,
+                get_settings(config),
+                log=self.log_message,
+                host=self.browser_host
+            )
+        except Exception as e:
+            # Bad flow or slot filters, nothing was started
+            self.log_message(f"Error: {str(e)}")
+            return
+        if len(profiles) > 1:
+            self.log_message(f"[DEBUG] Searching for {len(profiles)} patients in one browser...")
+        self.engine = engine
+        self.metrics = engine.metrics
         self.search_running = True
+        self.search_stopping = False
         self.status = "Running..."
         
         # Start the search in a separate thread
-        self.search_thread = threading.Thread(target=self.run_search)
+        self.search_thread = threading.Thread(target=self.run_search, args=(engine,))
         self.search_thread.daemon = True
         self.search_thread.start()
 
     def stop_search(self):
-        self.search_running = False
+        self.search_stopping = True
         self.status = "Stopping..."
+        # The search thread tears the browser down and posts 'stopped' when done
+        self.engine.stop()
 
-    def run_search(self):
-        config = {
-            "personal_info": {
-                field: self.fields[field]['text']
-                for field in self.fields
-            }
-        }
-        
+    def run_search(self, engine):
         try:
-            self.run_browser_automation(config)
+            engine.run()
         except Exception as e:
             self.log_message(f"Error: {str(e)}")
         finally:
-            self.search_running = False
-            self.status = "Ready to start"
-
-    def run_browser_automation(self, config):
-        # Create screenshots directories
-        for directory in ["screenshots", "error_screenshots"]:
-            if not os.path.exists(directory):
-                os.makedirs(directory)
-        
-        with sync_playwright() as p:
-            browser = None
-            context = None
-            try:
-                self.log_message("[DEBUG] Starting browser automation...")
-                
-                # Simplified path handling
-                playwright_paths = get_playwright_path()
-                launch_args = {
-                    'headless': False,
-                    'args': ['--disable-redirect-limits']
-                }
-                
-                if playwright_paths:
-                    os.environ['PLAYWRIGHT_BROWSERS_PATH'] = playwright_paths['browser_path']
-                
-                browser = p.chromium.launch(**launch_args)
-                
-                self.log_message("[DEBUG] Creating new context...")
-                context = browser.new_context(
-                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
-                )
-                page = context.new_page()
-                
-                self.log_message("[DEBUG] Navigating to form page...")
-                page.goto(
-                    'https://rvsq.gouv.qc.ca/prendrerendezvous/Principale.aspx',
-                    timeout=60000,
-                    wait_until='networkidle'
-                )
-                
-                self.log_message("[DEBUG] Accepting cookies...")
-                page.locator('#btnToutAccepter').click()
-                
-                self.log_message("[DEBUG] Filling form fields...")
-                personal_info = config['personal_info']
-                page.fill('#ctl00_ContentPlaceHolderMP_AssureForm_FirstName', personal_info['first_name'])
-                page.fill('#ctl00_ContentPlaceHolderMP_AssureForm_LastName', personal_info['last_name'])
-                page.fill('#ctl00_ContentPlaceHolderMP_AssureForm_NAM', personal_info['nam'])
-                page.fill('#ctl00_ContentPlaceHolderMP_AssureForm_CardSeqNumber', personal_info['card_seq_number'])
-                
-                # Fill birth date fields
-                page.fill('#ctl00_ContentPlaceHolderMP_AssureForm_Day', personal_info['birth_day'])
-                page.select_option('#ctl00_ContentPlaceHolderMP_AssureForm_Month', personal_info['birth_month'])
-                page.fill('#ctl00_ContentPlaceHolderMP_AssureForm_Year', personal_info['birth_year'])
-                
-                self.log_message("[DEBUG] Checking consent checkbox...")
-                page.check('#AssureForm_CSTMT')
-                
-                self.log_message("[DEBUG] Waiting for Continue button...")
-                page.wait_for_selector('#ctl00_ContentPlaceHolderMP_myButton:not([disabled])')
-                
-                self.log_message("[DEBUG] Clicking Continue button...")
-                page.click('#ctl00_ContentPlaceHolderMP_myButton')
-                
-                self.log_message("[DEBUG] Waiting for navigation...")
-                page.wait_for_load_state('networkidle')
-                
-                self.log_message("[DEBUG] Checking if user has a family doctor...")
-                
-                # Wait a moment for the page to load
-                page.wait_for_load_state('networkidle')
-                page.wait_for_timeout(2000)
-                
-                # Check for family doctor
-                has_family_doctor = page.locator("a.h-SelectAssureBtn.ctx-changer[data-type='1']").is_visible()
-                no_family_doctor = page.locator("text=pas de médecin de famille").is_visible()
-                
-                if no_family_doctor:
-                    self.log_message("[DEBUG] No family doctor detected, proceeding with appointment search...")
-                    self.log_message("[DEBUG] Clicking proximity button for no family doctor case...")
-                    page.click("a.h-SelectAssureBtn.ctx-changer[data-type='3']")
-                elif has_family_doctor:
-                    self.log_message("[DEBUG] Family doctor detected, proceeding with appointment search...")
-                    page.click("a.h-SelectAssureBtn.ctx-changer[data-type='1']")
-                else:
-                    self.log_message("[DEBUG] Could not determine family doctor status")
-                    return
-                
-                self.log_message("[DEBUG] Waiting for dropdown...")
-                page.wait_for_selector('#consultingReason', state='visible', timeout=60000)
-                page.wait_for_timeout(2000)
-                
-                self.log_message("[DEBUG] Selecting 'Consultation Urgente'...")
-                page.click('#consultingReason')
-                page.select_option('#consultingReason', 'ac2a5fa4-8514-11ef-a759-005056b11d6c')
-                
-                if not has_family_doctor:
-                    self.log_message("[DEBUG] Setting 50km radius...")
-                    page.wait_for_selector('#perimeterCombo', state='visible')
-                    page.wait_for_timeout(1000)
-                
-                self.log_message("[DEBUG] Clicking 'Rechercher' button...")
-                page.click('button:has-text("Rechercher")')
-                page.wait_for_load_state('networkidle')
-                
-                if has_family_doctor:
-                    self.log_message("[DEBUG] Clicking GMF button...")
-                    page.click('div.thumbnail.tmbArrow.tmbBtn.h-butType2dot2:has-text("Prendre rendez-vous avec un professionnel de la santé de mon groupe de médecine de famille (GMF)")')
-                    
-                    self.log_message("[DEBUG] Clicking 'Rechercher' again...")
-                    page.click('button:has-text("Rechercher")')
-                    page.wait_for_load_state('networkidle')
-                    page.click('div.thumbnail.tmbArrow.tmbBtn.h-butType3:has-text("Prendre rendez-vous dans une clinique à proximité")')
-                
-                elif not has_family_doctor:
-                    page.wait_for_load_state('networkidle')
-                
-                    self.log_message("[DEBUG] Clicking 'Rechercher' again...")
-                    page.click('button:has-text("Rechercher")')
-                    page.wait_for_load_state('networkidle')
-                
-                
-                
-                try:
-                    page.select_option('#perimeterCombo', '4')
-                except:
-                    try:
-                        page.click('#perimeterCombo')
-                        page.select_option('#perimeterCombo', value='4')
-                    except:
-                        page.evaluate('document.getElementById("perimeterCombo").value = "4"')
-
-                while self.search_running:  # Check if we should continue running
-                    try:
-                        self.log_message("[DEBUG] Searching for slots...")
-                        page.click('button.h-SearchButton.btn.btn-primary:has-text("Rechercher")')
-                        page.wait_for_load_state('networkidle')
-                        page.wait_for_timeout(2000)
-                        
-                        no_slots_element = page.locator('#clinicsWithNoDisponibilities')
-                        no_slots_text = page.locator('text=Aucun rendez-vous rpondant')
-                        no_slots_full_text = page.locator('text=Aucun rendez-vous répondant à vos critères de recherche n\'est disponible pour le moment.')
-                        clinic_section = page.locator('text=Les cliniques suivantes offrent des disponibilités pour votre rendez-vous :')
-                        
-                        has_negative_indicators = (
-                            no_slots_text.is_visible() or 
-                            no_slots_element.is_visible() or
-                            no_slots_full_text.is_visible()
-                        )
-                        
-                        if has_negative_indicators:
-                            self.log_message("[DEBUG] No slots available")
-                        elif clinic_section.is_visible():
-                            self.log_message("🎉 SLOT FOUND! 🎉")
-                            winsound.Beep(1000, 500)
-                            winsound.Beep(2000, 500)
-                            
-                            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                            screenshot_path = os.path.join("screenshots", f"slot_found_{timestamp}.png")
-                            page.screenshot(path=screenshot_path, full_page=True)
-                            self.log_message(f"Screenshot saved: {screenshot_path}")
-                        
-                        if not self.search_running:
-                            break
-                            
-                        page.wait_for_timeout(5000)
-                        
-                    except Exception as e:
-                        self.log_message(f"Error during search: {str(e)}")
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        error_path = os.path.join("error_screenshots", f"error_{timestamp}.png")
-                        page.screenshot(path=error_path, full_page=True)
-                        break
-                    
-            except Exception as e:
-                self.log_message(f"\n[ERROR] An error occurred: {str(e)}")
-                if page:
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    error_path = os.path.join("error_screenshots", f"error_{timestamp}.png")
-                    page.screenshot(path=error_path, full_page=True)
-            finally:
-                if context:
-                    context.close()
-                if browser:
-                    browser.close()
+            self.post_event('stopped', engine)
 
     def update(self):
         # Update cursor blink
         current_time = pygame.time.get_ticks()
-        if current_time - self.cursor_timer > self.CURSOR_BLINK_TIME:
+        if current_time - self.cursor_timer >= self.CURSOR_BLINK_TIME:
             self.cursor_visible = not self.cursor_visible
             self.cursor_timer = current_time
+            if self.active_field:
+                self.invalidate(self.fields[self.active_field]['rect'].inflate(4, 4))
 
     def update_language(self):
         """Update all text elements when language changes"""
+        self.text_cache.clear()
         for field_name in self.fields:
             self.fields[field_name]['label'] = self.get_text(field_name)
             self.fields[field_name]['placeholder'] = self.get_text(f'placeholder_{field_name}')
@@ -918,17 +3249,102 @@ def main():
     app = AppGUI()
     clock = pygame.time.Clock()
     
+    # Get the browser going while the user fills in the form
+    settings = get_settings(load_config())
+    if settings['prewarm_browser']:
+        app.browser_host.warm(settings)
+    
     while app.running:
-        for event in pygame.event.get():
+        # Sleep until an input, a search event or the next cursor blink
+        event = pygame.event.wait(app.next_wakeup())
+        for event in [event] + pygame.event.get():
             if event.type == pygame.QUIT:
                 app.running = False
             app.handle_event(event)
         
+        app.process_events()
         app.update()  # Add this line to update cursor blink
         app.draw()
-        clock.tick(60)
+        clock.tick(60)  # Caps the redraw rate during bursts of mouse motion
     
+    # Close the window right away, the browser shuts down behind it
+    pygame.display.quit()
+    if app.search_running:
+        if not app.search_stopping:
+            app.stop_search()
+        app.search_thread.join(timeout=15)
+    app.browser_host.shutdown()
     pygame.quit()
 
+def run_headless(args):
+    """Run the search engine without a window, for always-on servers.
+
+    Patients come from the config file, messages go to stdout and the
+    rotating log file, and SIGTERM or Ctrl+C stop the search cleanly.
+    """
+    config = load_config(args.config)
+    settings = get_settings(config)
+    settings['headless_browser'] = True
+
+    handlers = [logging.StreamHandler(sys.stdout)]
+    log_file = args.log_file or settings['log_file']
+    if log_file:
+        handlers.append(log_file_handler(log_file, settings))
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s %(levelname)s %(message)s',
+        handlers=handlers
+    )
+    logger = logging.getLogger('meulade')
+
+    profiles = get_profiles(config)
+    if not profiles:
+        logger.error("No patient in %s, fill in personal_info or profiles", args.config)
+        return 1
+
+    def log(message):
+        if '[DEBUG]' in message:
+            logger.debug(message)
+        else:
+            logger.info(message)
+
+    try:
+        engine = SearchEngine(profiles, settings, log=log)
+    except ValueError as e:
+        logger.error("Bad settings: %s", e)
+        return 1
+
+    def handle_signal(signum, frame):
+        logger.info("Received signal %s, stopping...", signum)
+        engine.stop()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    logger.info("Searching for %d patient(s)", len(profiles))
+    try:
+        engine.run()
+    except Exception as e:
+        logger.error("Search stopped: %s", e)
+        return 1
+    logger.info("Stopped. %s", engine.metrics.status_line() or "No poll completed")
+    return 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="RVSQ appointment finder")
+    parser.add_argument('--headless', action='store_true', help="run without a window, reading patients from the config file")
+    parser.add_argument('--config', default='config.json', help="config file (default: config.json)")
+    parser.add_argument('--log-file', help="log file to use instead of settings.log_file (headless mode)")
+    parser.add_argument('--verbose', action='store_true', help="include debug messages (headless mode)")
+    parser.add_argument('--report', action='store_true', help="print when and where slots were found, from settings.history_db")
+    parser.add_argument('--days', type=int, default=30, help="days of history covered by --report (default: 30)")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.report:
+        print('\n'.join(history_report(get_settings(load_config(args.config))['history_db'], args.days)))
+        sys.exit(0)
+    if args.headless:
+        sys.exit(run_headless(args))
     main()
@@ -0,0 +1,431 @@
+"""Local stand-in for the RVSQ booking site, to test and benchmark meulade.py offline.
+
+    python mock_rvsq.py --port 8765 --latency-ms 150 --slot-every-s 60
+
+Reproduces the pages the flow in flow.json goes through: the cookie banner
+and assuré form of Principale.aspx, the family doctor / proximity choice,
+the consulting reason and perimeter, the search results (returned as an
+ASP.NET style {"d": "<html>"} payload) and holding then confirming a slot.
+Latency, errors, session expiry and when slots show up can all be
+injected. Point the flow at it with "variables": {"site":
+"http://127.0.0.1:8765"} in a copy of flow.json.
+"""
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http.cookies import SimpleCookie
+import html
+import json
+import random
+import secrets
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+BASE_PATH = '/prendrerendezvous'
+SESSION_COOKIE = 'ASP.NET_SessionId'
+
+CONSULTING_REASONS = {
+    'ac2a5fa4-8514-11ef-a759-005056b11d6c': 'Consultation urgente',
+    'ac2a5fa4-8514-11ef-a759-005056b11d6d': 'Suivi',
+    'ac2a5fa4-8514-11ef-a759-005056b11d6e': 'Suivi de grossesse',
+}
+PERIMETERS = {'1': 10, '2': 20, '3': 30, '4': 50, '5': 100}  # Value -> radius in km
+
+GMF_CHOICE = 'Prendre rendez-vous avec un professionnel de la santé de mon groupe de médecine de famille (GMF)'
+NEARBY_CHOICE = 'Prendre rendez-vous dans une clinique à proximité'
+
+PAGE = """<!DOCTYPE html>
+<html lang="fr">
+<head><meta charset="utf-8"><title>Rendez-vous santé Québec (mock)</title></head>
+<body>
+{body}
+</body>
+</html>"""
+
+FORM_FIELDS = ('FirstName', 'LastName', 'NAM', 'CardSeqNumber', 'Day', 'Month', 'Year')
+
+SEARCH_SCRIPT = """<script>
+async function search() {
+    const response = await fetch('Recherche.aspx/Search', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json; charset=utf-8'},
+        body: JSON.stringify({
+            reason: document.getElementById('consultingReason').value,
+            perimeter: document.getElementById('perimeterCombo').value,
+            postalCode: document.getElementById('postalCode').value,
+            type: document.body.dataset.type
+        })
+    });
+    if (response.status === 401) {
+        location.href = 'Principale.aspx';
+        return;
+    }
+    const results = document.getElementById('results');
+    results.innerHTML = response.ok ? (await response.json()).d : '<p class="error">Erreur du serveur</p>';
+}
+
+async function post(action, slot) {
+    const response = await fetch('Recherche.aspx/' + action, {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json; charset=utf-8'},
+        body: JSON.stringify({slot: slot})
+    });
+    document.getElementById('results').innerHTML = (await response.json()).d;
+}
+</script>"""
+
+class MockSite:
+    """State of the mock site: sessions, published slots and what was asked of it.
+
+    With slot_every_s, slot number k is published k * slot_every_s seconds
+    after start and stays available for slot_lifetime_s. A schedule adds slots
+    at fixed offsets: [{"at_s": 30, "duration_s": 60, "clinic": "...",
+    "date": "2026-11-02", "time": "9h30", "distance_km": 4.2}].
+    """
+
+    def __init__(self, latency_ms=0, jitter_ms=0, search_latency_ms=0, slot_every_s=0,
+                 slot_lifetime_s=30, schedule=None, family_doctor=False, session_ttl_s=0, error_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.search_latency_ms = search_latency_ms
+        self.slot_every_s = slot_every_s
+        self.slot_lifetime_s = slot_lifetime_s
+        self.schedule = schedule or []
+        self.family_doctor = family_doctor
+        self.session_ttl_s = session_ttl_s
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.sessions = {}  # Session id -> creation time
+        self.requests = {}  # Path -> count
+        self.searches = 0
+        self.errors = 0
+        self.first_search_at = None
+        self.holds = {}  # Slot id -> time it was held
+        self.bookings = {}  # Slot id -> time it was confirmed
+
+    def wait(self, extra_ms=0):
+        """Sleep for the configured latency"""
+        delay = self.latency_ms + extra_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def count(self, path):
+        with self.lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def new_session(self):
+        session_id = secrets.token_hex(12)
+        with self.lock:
+            self.sessions[session_id] = time.time()
+        return session_id
+
+    def valid_session(self, session_id):
+        with self.lock:
+            created = self.sessions.get(session_id)
+        if created is None:
+            return False
+        return not self.session_ttl_s or time.time() - created < self.session_ttl_s
+
+    def published_slots(self, until=None):
+        """Every slot with the time it was published, in publication order"""
+        until = time.time() if until is None else until
+        slots = []
+        if self.slot_every_s:
+            k = 1
+            while self.started + k * self.slot_every_s <= until:
+                published = self.started + k * self.slot_every_s
+                slots.append({
+                    'id': f"auto-{k}",
+                    'published_at': published,
+                    'expires_at': published + self.slot_lifetime_s,
+                    'clinic': f"Clinique médicale Mock {k % 5 + 1}",
+                    'date': time.strftime('%Y-%m-%d', time.localtime(published + 86400 * (1 + k % 7))),
+                    'time': f"{8 + k % 9}h{(k * 10) % 60:02d}",
+                    'professional': f"Dre Mock {k}",
+                    'distance_km': round(2.5 + (k * 7) % 60, 1),
+                })
+                k += 1
+        for i, entry in enumerate(self.schedule):
+            published = self.started + entry['at_s']
+            if published <= until:
+                slot = dict(entry, id=f"schedule-{i}", published_at=published, expires_at=published + entry.get('duration_s', self.slot_lifetime_s))
+                slot.setdefault('clinic', 'Clinique médicale Mock')
+                slots.append(slot)
+        return sorted(slots, key=lambda slot: slot['published_at'])
+
+    def available_slots(self, radius_km):
+        now = time.time()
+        with self.lock:
+            taken = set(self.holds) | set(self.bookings)
+        return [
+            slot for slot in self.published_slots(now)
+            if slot['expires_at'] > now and (slot.get('distance_km') or 0) <= radius_km and slot['id'] not in taken
+        ]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'started': self.started,
+                'uptime_s': round(time.time() - self.started, 3),
+                'sessions': len(self.sessions),
+                'searches': self.searches,
+                'errors': self.errors,
+                'first_search_at': self.first_search_at,
+                'holds': dict(self.holds),
+                'bookings': dict(self.bookings),
+                'requests': dict(self.requests),
+                'published': [
+                    {'id': slot['id'], 'published_at': slot['published_at'], 'clinic': slot['clinic'], 'date': slot.get('date', ''), 'time': slot.get('time', '')}
+                    for slot in self.published_slots()
+                ],
+            }
+
+    def search(self, criteria):
+        """Answer one search, returns (status, payload)"""
+        with self.lock:
+            self.searches += 1
+            if self.first_search_at is None:
+                self.first_search_at = time.time()
+            failed = random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        self.wait(self.search_latency_ms)
+        if failed:
+            return 503, {'Message': 'Service indisponible'}
+
+        fragment = ''
+        if criteria.get('type') == '1':
+            fragment += (
+                f'<div class="thumbnail tmbArrow tmbBtn h-butType2dot2" onclick="this.classList.add(\'selected\')">{GMF_CHOICE}</div>'
+                f'<div class="thumbnail tmbArrow tmbBtn h-butType3" onclick="this.classList.add(\'selected\')">{NEARBY_CHOICE}</div>'
+            )
+        slots = self.available_slots(PERIMETERS.get(criteria.get('perimeter'), 50))
+        if slots:
+            fragment += '<div id="clinicsWithDisponibilities"><p>Les cliniques suivantes offrent des disponibilités pour votre rendez-vous</p>'
+            for slot in slots:
+                fragment += '<div class="clinic-result">'
+                fragment += f"<h4>{html.escape(slot['clinic'])}</h4>"
+                if slot.get('distance_km') is not None:
+                    fragment += f"<p>{slot['distance_km']} km</p>"
+                if slot.get('professional'):
+                    fragment += f"<p>{html.escape(slot['professional'])}</p>"
+                fragment += (
+                    f"<p>{html.escape(slot.get('date', ''))}</p>"
+                    f"<button type=\"button\" class=\"h-SlotBtn\" onclick=\"post('Reserve', '{slot['id']}')\">{html.escape(slot.get('time', ''))}</button></div>"
+                )
+            fragment += '</div>'
+        else:
+            fragment += (
+                '<div id="clinicsWithNoDisponibilities">'
+                "<p>Aucun rendez-vous répondant à vos critères n'est disponible pour le moment.</p></div>"
+            )
+        return 200, {'d': fragment}
+
+    def hold(self, slot_id):
+        """Hold a slot for the session, returns (status, payload)"""
+        self.wait(self.search_latency_ms)
+        with self.lock:
+            if slot_id in self.holds or slot_id in self.bookings:
+                return 409, {'d': '<p class="error">Ce rendez-vous n\'est plus disponible.</p>'}
+            self.holds[slot_id] = time.time()
+        return 200, {'d': (
+            '<div id="holdPanel"><p>Rendez-vous réservé temporairement pour 5 minutes.</p>'
+            f'<button type="button" id="btnConfirmer" onclick="post(\'Confirm\', \'{slot_id}\')">Confirmer</button></div>'
+        )}
+
+    def confirm(self, slot_id):
+        self.wait(self.search_latency_ms)
+        with self.lock:
+            if slot_id not in self.holds:
+                return 409, {'d': '<p class="error">Réservation expirée.</p>'}
+            del self.holds[slot_id]
+            self.bookings[slot_id] = time.time()
+        return 200, {'d': '<p id="bookingConfirmed">Votre rendez-vous est confirmé.</p>'}
+
+class MockHandler(BaseHTTPRequestHandler):
+    site = None  # MockSite, set by serve()
+
+    def log_message(self, format, *args):
+        pass
+
+    def session_id(self):
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        return cookie[SESSION_COOKIE].value if SESSION_COOKIE in cookie else None
+
+    def send(self, status, body, content_type='text/html; charset=utf-8', headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def redirect(self, location, headers=None):
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.site.count(url.path)
+        if url.path == '/__mock/stats':
+            self.send(200, json.dumps(self.site.stats()), 'application/json')
+            return
+        self.site.wait()
+        if url.path in ('/', f'{BASE_PATH}/Principale.aspx'):
+            self.send(200, self.form_page())
+        elif url.path == f'{BASE_PATH}/Choix.aspx':
+            if not self.site.valid_session(self.session_id()):
+                self.redirect(f'{BASE_PATH}/Principale.aspx')
+                return
+            self.send(200, self.choice_page())
+        elif url.path == f'{BASE_PATH}/Recherche.aspx':
+            if not self.site.valid_session(self.session_id()):
+                self.redirect(f'{BASE_PATH}/Principale.aspx')
+                return
+            search_type = parse_qs(url.query).get('type', ['3'])[0]
+            self.send(200, self.search_page(search_type))
+        else:
+            self.send(404, PAGE.format(body='<h1>Page introuvable</h1>'))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        self.site.count(url.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8', errors='replace')
+
+        if url.path == f'{BASE_PATH}/Principale.aspx':
+            self.site.wait()
+            fields = {name: values[0] for name, values in parse_qs(body).items()}
+            missing = [name for name in FORM_FIELDS if not fields.get(name, '').strip()]
+            if missing or fields.get('CSTMT') != 'on':
+                self.send(200, self.form_page(error='Veuillez remplir tous les champs et accepter les conditions.'))
+                return
+            session_id = self.site.new_session()
+            self.redirect(f'{BASE_PATH}/Choix.aspx', {'Set-Cookie': f'{SESSION_COOKIE}={session_id}; Path=/; HttpOnly'})
+        elif url.path == f'{BASE_PATH}/Recherche.aspx/Search':
+            if not self.site.valid_session(self.session_id()):
+                self.site.wait()
+                self.send(401, json.dumps({'Message': 'Session expirée'}), 'application/json')
+                return
+            try:
+                criteria = json.loads(body or '{}')
+            except ValueError:
+                criteria = {}
+            status, payload = self.site.search(criteria)
+            self.send(status, json.dumps(payload, ensure_ascii=False), 'application/json; charset=utf-8')
+        elif url.path in (f'{BASE_PATH}/Recherche.aspx/Reserve', f'{BASE_PATH}/Recherche.aspx/Confirm'):
+            if not self.site.valid_session(self.session_id()):
+                self.send(401, json.dumps({'Message': 'Session expirée'}), 'application/json')
+                return
+            try:
+                slot_id = json.loads(body or '{}').get('slot', '')
+            except ValueError:
+                slot_id = ''
+            action = self.site.hold if url.path.endswith('Reserve') else self.site.confirm
+            status, payload = action(slot_id)
+            self.send(status, json.dumps(payload, ensure_ascii=False), 'application/json; charset=utf-8')
+        else:
+            self.send(404, PAGE.format(body='<h1>Page introuvable</h1>'))
+
+    def form_page(self, error=''):
+        prefix = 'ctl00_ContentPlaceHolderMP_AssureForm_'
+        inputs = ''.join(
+            f'<label>{name} <input id="{prefix}{name}" name="{name}"></label><br>'
+            for name in ('FirstName', 'LastName', 'NAM', 'CardSeqNumber', 'Day', 'Year')
+        )
+        months = ''.join(f'<option value="{month:02d}">{month}</option>' for month in range(1, 13))
+        error_html = f'<p class="error">{html.escape(error)}</p>' if error else ''
+        return PAGE.format(body=f"""
+<div id="cookieBanner">Ce site utilise des témoins.
+    <button id="btnToutAccepter" type="button" onclick="document.getElementById('cookieBanner').remove()">Tout accepter</button>
+</div>
+<h1>Prendre rendez-vous</h1>
+{error_html}
+<form method="post" action="{BASE_PATH}/Principale.aspx">
+    {inputs}
+    <label>Mois <select id="{prefix}Month" name="Month"><option value=""></option>{months}</select></label><br>
+    <label><input type="checkbox" id="AssureForm_CSTMT" name="CSTMT"
+        onchange="document.getElementById('ctl00_ContentPlaceHolderMP_myButton').disabled = !this.checked">
+        J'accepte les conditions d'utilisation</label><br>
+    <button id="ctl00_ContentPlaceHolderMP_myButton" type="submit" disabled>Continuer</button>
+</form>""")
+
+    def choice_page(self):
+        if self.site.family_doctor:
+            choices = (
+                '<p>Votre médecin de famille : Dre Mock</p>'
+                '<a class="h-SelectAssureBtn ctx-changer" data-type="1" href="Recherche.aspx?type=1">Avec mon médecin de famille</a><br>'
+            )
+        else:
+            choices = '<p>Vous n\'avez pas de médecin de famille.</p>'
+        choices += '<a class="h-SelectAssureBtn ctx-changer" data-type="3" href="Recherche.aspx?type=3">Dans une clinique à proximité</a>'
+        return PAGE.format(body=f'<h1>Type de rendez-vous</h1>{choices}')
+
+    def search_page(self, search_type):
+        reasons = ''.join(
+            f'<option value="{value}">{html.escape(label)}</option>'
+            for value, label in CONSULTING_REASONS.items()
+        )
+        perimeters = ''.join(f'<option value="{value}">{radius} km</option>' for value, radius in PERIMETERS.items())
+        return PAGE.format(body=f"""
+<h1>Rechercher un rendez-vous</h1>
+<script>document.body.dataset.type = '{search_type}';</script>
+<label>Raison de consultation
+    <select id="consultingReason" onchange="document.getElementById('perimeterCombo').disabled = !this.value">
+        <option value=""></option>{reasons}
+    </select></label><br>
+<label>Périmètre <select id="perimeterCombo" disabled>{perimeters}</select></label><br>
+<label>Code postal <input id="postalCode"></label><br>
+<button type="button" class="h-SearchButton btn btn-primary" onclick="search()">Rechercher</button>
+<div id="results"></div>
+{SEARCH_SCRIPT}""")
+
+def serve(site, port=0, host='127.0.0.1'):
+    """Serve site from a daemon thread, returns the server (server_address has the port)"""
+    handler = type('Handler', (MockHandler,), {'site': site})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the RVSQ booking site")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0, help="delay added to every page")
+    parser.add_argument('--jitter-ms', type=float, default=0, help="random extra delay, up to this much")
+    parser.add_argument('--search-latency-ms', type=float, default=0, help="extra delay of the search request")
+    parser.add_argument('--slot-every-s', type=float, default=0, help="publish a new slot this often (0: never)")
+    parser.add_argument('--slot-lifetime-s', type=float, default=30, help="how long a published slot stays available")
+    parser.add_argument('--schedule', help="JSON file listing slots to publish at fixed offsets")
+    parser.add_argument('--family-doctor', action='store_true', help="patients have a family doctor (GMF branch)")
+    parser.add_argument('--session-ttl-s', type=float, default=0, help="expire sessions after this long (0: never)")
+    parser.add_argument('--error-rate', type=float, default=0, help="fraction of searches answered with HTTP 503")
+    args = parser.parse_args()
+
+    schedule = None
+    if args.schedule:
+        with open(args.schedule, 'r', encoding='utf-8') as f:
+            schedule = json.load(f)
+    site = MockSite(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, search_latency_ms=args.search_latency_ms,
+        slot_every_s=args.slot_every_s, slot_lifetime_s=args.slot_lifetime_s, schedule=schedule,
+        family_doctor=args.family_doctor, session_ttl_s=args.session_ttl_s, error_rate=args.error_rate,
+    )
+    server = serve(site, args.port)
+    print(f"Mock RVSQ on http://127.0.0.1:{server.server_address[1]}{BASE_PATH}/Principale.aspx (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Checks of the SQLite poll history and the --report built from it.
+
+    python -m pytest -q
+"""
+
+from datetime import datetime
+import sqlite3
+
+import meulade
+from meulade import Slot
+
+def test_history_report(tmp_path):
+    path = str(tmp_path / 'history.sqlite3')
+    store = meulade.HistoryStore({'history_db': path})
+    store.start()
+    a = Slot('Clinique A', '2026-10-20', '9h30', '', 3.0)
+    for _ in range(9):
+        store.record_poll('Ann T', 'default', 'none', 0.4)
+    store.record_poll('Ann T', 'default', 'slots', 0.5, [a], [a])
+    store.record_poll('Bob', 'default', 'error', error='timeout')
+    store.close()
+
+    report = '\n'.join(meulade.history_report(path))
+    assert 'Clinique A: 1, 3 km' in report
+    assert 'Ann T: 10 polls, 1 with new slots, 10 polls per hit, 0.0% errors, p50 0.40 s' in report
+    assert 'Bob: 1 polls, 0 with new slots, no hit yet, 100.0% errors' in report
+    weekday = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')[datetime.now().weekday()]
+    assert any(line.startswith(weekday) and line.endswith(' 1') for line in report.splitlines())
+
+def test_history_report_without_history(tmp_path):
+    assert meulade.history_report(str(tmp_path / 'missing.sqlite3'))[0].startswith('No history')
+    assert 'empty' in meulade.history_report('')[0]
+
+def test_history_store_writes_every_row_of_full_batches(tmp_path):
+    path = str(tmp_path / 'history.sqlite3')
+    store = meulade.HistoryStore({'history_db': path})
+    # Queued before the writer starts, so the first batches are full
+    for _ in range(2 * meulade.HistoryStore.MAX_BATCH + 200):
+        store.record_poll('Ann T', 'default', 'none', 0.4)
+    store.start()
+    store.close()
+    connection = sqlite3.connect(path)
+    assert connection.execute('SELECT COUNT(*) FROM polls').fetchone()[0] == 2 * meulade.HistoryStore.MAX_BATCH + 200
+    connection.close()
+
+def test_history_report_breaks_clinics_down_by_hour(tmp_path):
+    path = str(tmp_path / 'history.sqlite3')
+    store = meulade.HistoryStore({'history_db': path})
+    store.start()
+    slots = [Slot('Clinique A', '2026-10-20', '9h30'), Slot('Clinique B', '2026-10-20', '9h45')]
+    store.record_poll('Ann T', 'default', 'slots', 0.5, slots, slots)
+    store.record_poll('Ann T', 'default', 'slots', 0.5, slots[:1], [])
+    store.close()
+
+    lines = meulade.history_report(path)
+    grid = lines[lines.index("New slots of those clinics by hour:") + 2:]
+    rows = {line[:24].strip(): line for line in grid if line.startswith('Clinique')}
+    assert set(rows) == {'Clinique A', 'Clinique B'}
+    # One new slot each, at the hour of the poll
+    column = 26 + 3 * datetime.now().hour
+    assert all(row[column] == '@' and row.endswith(' 1') for row in rows.values())
@@ -0,0 +1,127 @@
+"""Checks of merge_results and of the flow runner on a fake page.
+
+    python -m pytest -q
+
+The other parts have their own test_*.py files. No browser is needed.
+"""
+
+import asyncio
+
+import pytest
+
+import meulade
+from meulade import Slot, SearchResult, SearchVariant
+
+SETTINGS = dict(meulade.DEFAULT_SETTINGS)
+
+# merge_results
+
+def test_merge_results_keeps_the_variant_of_each_slot():
+    first, second = SearchVariant({'perimeter': '4'}, main=True), SearchVariant({'perimeter': '5'})
+    a, b = Slot('A', '2026-11-02', '9h30'), Slot('B', '2026-11-02', '10h00')
+    merged = meulade.merge_results([
+        SearchResult('slots', [a], size=10, variant=first),
+        SearchResult('slots', [b, a], size=20, variant=second),
+    ])
+    assert merged.state == 'slots'
+    assert merged.slots == [a, b]
+    assert merged.size == 30
+    assert merged.slot_variants == {a: first, b: second}
+
+def test_merge_results_states():
+    assert meulade.merge_results([SearchResult('none'), SearchResult('none')]).state == 'none'
+    assert meulade.merge_results([SearchResult('none'), SearchResult(None)]).state is None
+
+# FlowRunner
+
+class FakeLocator:
+    def __init__(self, page, selectors):
+        self.page = page
+        self.selectors = selectors
+        self.first = self
+
+    def or_(self, other):
+        return FakeLocator(self.page, self.selectors + other.selectors)
+
+    async def wait_for(self, state, timeout):
+        assert any(selector in self.page.visible for selector in self.selectors)
+
+    async def is_visible(self):
+        return any(selector in self.page.visible for selector in self.selectors)
+
+class FakePage:
+    """Records what the flow does, with a fixed set of visible selectors"""
+
+    def __init__(self, visible=()):
+        self.visible = set(visible)
+        self.actions = []
+
+    def locator(self, selector):
+        return FakeLocator(self, [selector])
+
+    def __getattr__(self, action):
+        async def record(*args, **kwargs):
+            self.actions.append((action,) + args)
+        return record
+
+def run_flow(flow, page, variables, start=None):
+    async def submit(page, selector, timeout=None):
+        page.actions.append(('submit', selector))
+        return type('Response', (), {'status': 200})()
+
+    runner = meulade.FlowRunner(flow, submit)
+    timings = []
+    asyncio.run(runner.run(page, variables, lambda message: None, timings, start=start))
+    return [name for name, _ in timings]
+
+BRANCH_FLOW = {
+    'variables': {'site': 'https://example.test'},
+    'search_button': '#search',
+    'steps': [
+        {'name': 'open', 'action': 'goto', 'url': '{site}/form'},
+        {'name': 'detect', 'action': 'branch', 'cases': [
+            {'selector': '#alone', 'set': {'family_doctor': False}, 'next': 'alone'},
+            {'selector': '#doctor', 'set': {'family_doctor': True}, 'next': 'doctor'},
+        ]},
+        {'name': 'alone', 'action': 'click', 'selector': '#alone', 'next': 'search'},
+        {'name': 'doctor', 'action': 'click', 'selector': '#doctor'},
+        {'name': 'gmf', 'action': 'click', 'selector': '#gmf', 'when': 'family_doctor'},
+        {'name': 'search', 'action': 'fill', 'selector': '#name', 'value': '{last_name}', 'end': True},
+        {'name': 'book', 'action': 'submit', 'selector': 'button:text-is("{time}")'},
+        {'name': 'confirm', 'action': 'click', 'selector': '#confirm', 'when': '!dry_run'},
+    ],
+}
+
+def test_flow_follows_the_matching_branch():
+    page = FakePage(visible={'#doctor'})
+    assert run_flow(BRANCH_FLOW, page, {'last_name': 'Tremblay'}) == ['open', 'detect', 'doctor', 'gmf', 'search']
+    assert page.actions[0] == ('goto', 'https://example.test/form')
+    assert page.actions[-1] == ('fill', '#name', 'Tremblay')
+
+def test_flow_skips_steps_whose_condition_is_false():
+    page = FakePage(visible={'#alone'})
+    assert run_flow(BRANCH_FLOW, page, {'last_name': 'Roy'}) == ['open', 'detect', 'alone', 'search']
+
+def test_flow_runs_from_a_start_step():
+    page = FakePage()
+    assert run_flow(BRANCH_FLOW, page, {'time': '9h30', 'dry_run': True}, start='book') == ['book']
+    assert page.actions == [('submit', 'button:text-is("9h30")')]
+
+def test_bundled_flow_is_valid():
+    runner = meulade.FlowRunner(meulade.load_flow(SETTINGS), None)
+    assert runner.booking_from in runner.steps
+    assert runner.hold_step in runner.steps
+
+def test_resumed_session_selects_the_reason_before_the_perimeter():
+    flow = meulade.load_flow(SETTINGS)
+    page = FakePage()
+    variables = {'consulting_reason': 'urgent', 'perimeter': '5'}
+    run_flow(flow, page, variables, start=flow['resume_from'])
+    selects = [action[1:3] for action in page.actions if action[0] == 'select_option']
+    assert selects == [('#consultingReason', 'urgent'), ('#perimeterCombo', '5')]
+
+def test_flow_rejects_jumps_to_unknown_steps():
+    flow = {'steps': [{'name': 'a', 'action': 'click', 'selector': '#a', 'next': 'nowhere'}]}
+    with pytest.raises(ValueError):
+        meulade.FlowRunner(flow, None)
+
@@ -0,0 +1,70 @@
+"""Checks of parse_search_response against the search answers of the mock site.
+
+    python -m pytest -q
+"""
+
+import json
+
+import meulade
+from meulade import Slot
+from mock_rvsq import MockSite
+
+def mock_payload(criteria=None, **site_options):
+    """Body of one search answered by a mock site"""
+    site = MockSite(**site_options)
+    status, payload = site.search(criteria or {'perimeter': '4'})
+    assert status == 200
+    return json.dumps(payload).encode('utf-8')
+
+def test_parse_slots_from_mock():
+    schedule = [
+        {'at_s': -10, 'clinic': 'Clinique A', 'date': '2026-11-02', 'time': '9h30', 'professional': 'Dre X', 'distance_km': 4.2},
+        {'at_s': -10, 'clinic': 'Clinique B', 'date': '2026-11-03', 'time': '14h00', 'distance_km': 12.0},
+    ]
+    result = meulade.parse_search_response(mock_payload(schedule=schedule), 'application/json')
+    assert result.state == 'slots'
+    assert result.slots == [
+        Slot('Clinique A', '2026-11-02', '9h30', 'Dre X', 4.2),
+        Slot('Clinique B', '2026-11-03', '14h00', '', 12.0),
+    ]
+
+def test_parse_no_slots_from_mock():
+    result = meulade.parse_search_response(mock_payload(), 'application/json')
+    assert result.state == 'none'
+    assert result.slots == []
+
+def test_parse_slots_outside_perimeter_are_not_listed():
+    schedule = [{'at_s': -10, 'clinic': 'Far', 'date': '2026-11-02', 'time': '9h30', 'distance_km': 80}]
+    result = meulade.parse_search_response(mock_payload({'perimeter': '4'}, schedule=schedule))
+    assert result.state == 'none'
+
+def test_parse_unknown_payload_reads_the_page():
+    assert meulade.parse_search_response(b'<html><body>Chargement...</body></html>').state is None
+
+def test_parse_guessed_json_slots_do_not_decide_the_state():
+    result = meulade.parse_search_response(b'{"d":"<p>x</p>","nom":"abc","dateModif":"2020"}')
+    assert result.state is None
+    assert result.slots == []
+
+def test_parse_json_slots_fill_in_a_bare_header():
+    payload = {
+        'd': f"<p>{meulade.SLOTS_MARKER}</p>",
+        'data': [{'clinique': 'A', 'date': '2026-10-20', 'heure': '9h00', 'dateNaissance': '1980-01-01'}],
+    }
+    result = meulade.parse_search_response(json.dumps(payload).encode('utf-8'))
+    assert result.state == 'slots'
+    assert result.slots == [Slot('A', '2026-10-20', '9h00')]
+
+def test_parse_html_document_skips_the_no_availability_section():
+    body = (
+        f"<html><body><p>{meulade.SLOTS_MARKER}</p>"
+        '<div class="clinic-result"><h4>Clinique A</h4><p>3,5 km</p><p>2 novembre 2026</p><button>9 h 30</button><button>10h15</button></div>'
+        '<div id="clinicsWithNoDisponibilities"><div class="clinic-result"><h4>Clinique B</h4></div></div>'
+        "</body></html>"
+    ).encode('utf-8')
+    result = meulade.parse_search_response(body, 'text/html')
+    assert result.state == 'slots'
+    assert result.slots == [
+        Slot('Clinique A', '2 novembre 2026', '9h30', '', 3.5),
+        Slot('Clinique A', '2 novembre 2026', '10h15', '', 3.5),
+    ]
@@ -0,0 +1,41 @@
+"""Checks of RetryPolicy, which picks the step a failed watch restarts from.
+
+    python -m pytest -q
+"""
+
+import pytest
+
+import meulade
+
+SETTINGS = dict(meulade.DEFAULT_SETTINGS, escalate_after_failures=2)
+
+def recovery_steps(kind, failed_step, count=5):
+    """Steps chosen after count failures in a row of the same kind"""
+    retry = meulade.RetryPolicy(SETTINGS)
+    steps = []
+    for _ in range(count):
+        retry.record_failure()
+        steps.append(retry.recovery_step(kind, failed_step))
+    return steps
+
+def test_poll_failures_escalate_to_earlier_steps():
+    assert recovery_steps('timeout', 'poll') == ['poll', 'poll', 'session', 'session', 'context']
+
+def test_form_failures_fill_the_form_again():
+    assert recovery_steps('timeout', 'session') == ['session', 'session', 'session', 'session', 'context']
+    assert recovery_steps('site_error', 'session')[0] == 'session'
+
+@pytest.mark.parametrize('kind', ['timeout', 'navigation', 'unknown'])
+def test_context_failures_open_a_new_context(kind):
+    assert set(recovery_steps(kind, 'context')) == {'context'}
+
+def test_browser_failures_relaunch_it():
+    assert recovery_steps('timeout', 'browser', 1) == ['browser']
+
+def test_success_resets_the_escalation():
+    retry = meulade.RetryPolicy(SETTINGS)
+    for _ in range(4):
+        retry.record_failure()
+    retry.record_success()
+    retry.record_failure()
+    assert retry.recovery_step('timeout', 'poll') == 'poll'
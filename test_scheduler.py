@@ -0,0 +1,56 @@
+"""Checks of PollScheduler, which picks the pause between two searches.
+
+    python -m pytest -q
+"""
+
+from datetime import datetime, timedelta
+import json
+
+import pytest
+
+import meulade
+
+SETTINGS = dict(meulade.DEFAULT_SETTINGS)
+
+@pytest.fixture
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(meulade.random, 'uniform', lambda low, high: 1.0)
+
+def scheduler(tmp_path, history=(), **settings):
+    path = tmp_path / 'release_history.json'
+    path.write_text(json.dumps([stamp.isoformat() for stamp in history]))
+    return meulade.PollScheduler(dict(SETTINGS, release_history_file=str(path), **settings))
+
+def test_fixed_interval_without_adaptive_polling(tmp_path):
+    assert scheduler(tmp_path, adaptive_polling=False, poll_interval_ms=5000).next_interval() == 5
+
+def test_interval_stays_within_bounds(tmp_path):
+    polls = scheduler(tmp_path, poll_interval_ms=5000, poll_interval_min_ms=2000, poll_interval_max_ms=6000)
+    for _ in range(20):
+        polls.record_poll(ok=False)
+    for _ in range(50):
+        assert 2 <= polls.next_interval() <= 6
+
+def test_interval_drops_to_minimum_around_past_releases(tmp_path, no_jitter):
+    now = datetime(2026, 10, 19, 9, 0)
+    history = [now.replace(day=day, minute=minute) for day, minute in ((5, 2), (6, 58), (7, 3), (8, 1), (9, 4))]
+    polls = scheduler(tmp_path, history, poll_interval_min_ms=2000, release_window_min=10)
+    assert polls.next_interval(now) == 2
+    # Far from any release, the pause grows back above the baseline
+    assert polls.next_interval(now.replace(hour=21)) > SETTINGS['poll_interval_ms'] / 1000
+
+def test_release_seen_twice_is_recorded_once(tmp_path):
+    polls = scheduler(tmp_path)
+    now = datetime(2026, 10, 19, 9, 0)
+    polls.record_release(now)
+    polls.record_release(now + timedelta(seconds=20))
+    assert polls.history == [now]
+
+def test_slow_searches_stretch_the_interval(tmp_path, no_jitter):
+    polls = scheduler(tmp_path, poll_interval_ms=5000)
+    for _ in range(50):
+        polls.record_poll(0.5)
+    steady = polls.next_interval()
+    for _ in range(5):
+        polls.record_poll(3.0)
+    assert polls.next_interval() > steady
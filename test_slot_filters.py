@@ -0,0 +1,75 @@
+"""Checks of the slot filter rules compiled by compile_slot_filter.
+
+    python -m pytest -q
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+import meulade
+from meulade import Slot
+
+MONDAY_MORNING = Slot('Clinique médicale Mock 2', '2026-10-19', '9h30', '', 5.0)
+
+def test_no_rule_lets_every_slot_through():
+    assert meulade.compile_slot_filter([])(MONDAY_MORNING)
+    assert meulade.compile_slot_filter({})(meulade.UNKNOWN_SLOT)
+
+@pytest.mark.parametrize('rule, expected', [
+    ({'clinics': ['mock 2']}, True),
+    ({'clinics': ['Mock 3']}, False),
+    ({'exclude_clinics': ['MOCK']}, False),
+    ({'max_distance_km': 5}, True),
+    ({'max_distance_km': 4}, False),
+    ({'max_distance_km': 0}, False),  # Zero is a limit, not "no limit"
+    ({'weekdays': ['mon']}, True),
+    ({'weekdays': ['sam', 'dim']}, False),
+    ({'hours': ['07:00-10:00']}, True),
+    ({'hours': ['17:00-21:00']}, False),
+    ({'hours': ['22:00-10:00']}, True),  # Past midnight
+    ({'earliest_date': '2026-10-20'}, False),
+    ({'latest_date': '2026-10-19'}, True),
+    ({'clinics': ['Mock 2'], 'weekdays': ['tue']}, False),  # Every key of a rule must match
+])
+def test_slot_rules(rule, expected):
+    assert meulade.compile_slot_filter(rule)(MONDAY_MORNING) is expected
+
+def test_slot_matches_any_of_several_rules():
+    predicate = meulade.compile_slot_filter([{'weekdays': ['sat']}, {'hours': ['09:00-09:45']}])
+    assert predicate(MONDAY_MORNING)
+    assert not predicate(Slot('X', '2026-10-19', '11h00'))
+
+def test_unreadable_details_never_reject_a_slot():
+    predicate = meulade.compile_slot_filter({
+        'clinics': ['Mock'], 'max_distance_km': 1, 'weekdays': ['sun'], 'hours': ['01:00-02:00'], 'within_days': 1,
+    })
+    assert predicate(meulade.UNKNOWN_SLOT)
+    assert predicate(Slot('', 'bientôt', ''))
+
+def test_french_dates_and_within_days():
+    soon = date.today() + timedelta(days=2)
+    months = {value: name for name, value in meulade.MONTH_NUMBERS.items()}
+    french = f"{soon.day} {months[soon.month]} {soon.year}"
+    assert meulade.parse_slot_date(french) == soon
+    assert meulade.compile_slot_filter({'within_days': 3})(Slot('X', french))
+    assert not meulade.compile_slot_filter({'within_days': 1})(Slot('X', french))
+
+@pytest.mark.parametrize('rule', [
+    {'bogus': 1},
+    {'weekdays': ['xyz']},
+    {'weekdays': [9]},
+    {'hours': ['9h-10h-11h']},
+    {'hours': ['later']},
+    {'within_days': 'soon'},
+    {'earliest_date': ''},
+])
+def test_bad_rules_raise_value_error(rule):
+    with pytest.raises(ValueError):
+        meulade.compile_slot_filter(rule)
+
+def test_within_zero_days_keeps_only_today():
+    today = date.today()
+    predicate = meulade.compile_slot_filter({'within_days': 0})
+    assert predicate(Slot('X', today.isoformat()))
+    assert not predicate(Slot('X', (today + timedelta(days=1)).isoformat()))
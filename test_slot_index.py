@@ -0,0 +1,25 @@
+"""Checks of SlotIndex, which decides which slots are announced.
+
+    python -m pytest -q
+"""
+
+import meulade
+from meulade import Slot
+
+def test_slot_index_announces_each_slot_once_until_it_expires():
+    index = meulade.SlotIndex(ttl=60)
+    a, b = Slot('A', '2026-11-02', '9h30'), Slot('B', '2026-11-02', '10h00')
+    assert index.update([a], now=0) == [a]
+    assert index.update([a, b], now=10) == [b]
+    assert index.update([a, b], now=20) == []
+    # a was not seen for longer than the ttl, so it counts as new again
+    assert index.update([a], now=100) == [a]
+
+def test_slot_index_treats_changed_details_as_new():
+    index = meulade.SlotIndex(ttl=60)
+    slot = Slot('A', '2026-11-02', '9h30', 'Dre X')
+    moved = Slot('A', '2026-11-02', '9h45', 'Dre X')
+    assert index.update([slot], now=0) == [slot]
+    assert index.update([moved], now=5) == [moved]
+    # Still remembered while it comes and goes within the ttl
+    assert index.update([slot], now=30) == []